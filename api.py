@@ -0,0 +1,270 @@
+import datetime
+import json
+
+from flask import Blueprint, Response, abort, current_app, request, \
+    stream_with_context
+from werkzeug.exceptions import HTTPException
+
+from autocomplete import complete
+from booking import book_shows, BookingError
+from forms import parse_start_time
+from models import db, Venue, Artist, Show, filter_by_genre, \
+    table_stamp, detail_stamp, detail_with_shows
+from pagination import paginate
+from routing import read_only
+from search import search
+from conditional import conditional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+# Mirrors the HTML read endpoints under /api/v1. Collections are keyset
+# paginated like the HTML listings; ?format=ndjson instead streams the whole
+# collection one row per line, read from the database in batches of
+# NDJSON_BATCH_SIZE. Shows can also be booked in batches through POST
+# /shows, see booking.py.
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+NDJSON_BATCH_SIZE = 1000
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+
+def json_response(obj, status=200):
+    return Response(dumps(obj), status=status, mimetype='application/json')
+
+
+def collection(query, keys, serialize):
+    """A page of `query` as JSON, or all of it as streamed NDJSON."""
+    if request.args.get('format') == 'ndjson':
+        def generate():
+            for row in query.order_by(*keys).yield_per(NDJSON_BATCH_SIZE):
+                yield dumps(serialize(row)) + b'\n'
+
+        return Response(stream_with_context(generate()),
+                        mimetype='application/x-ndjson')
+
+    page = paginate(
+        query,
+        keys=keys,
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int)
+    )
+
+    return json_response({'data': [serialize(row) for row in page.items],
+                          'next_cursor': page.next_cursor,
+                          })
+
+
+def serialize_summary(row):
+    return {'id': row.id,
+            'name': row.name,
+            'city': row.city,
+            'state': row.state,
+            }
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+@read_only
+@conditional(lambda: table_stamp(Venue))
+def venues():
+    return collection(
+        db.session.query(Venue.id, Venue.name, Venue.city, Venue.state),
+        (Venue.name, Venue.id),
+        serialize_summary
+    )
+
+
+@api.route('/venues/search')
+@read_only
+def search_venues():
+    results = search(Venue, request.args.get('q'),
+                     request.args.get('limit', type=int))
+    return json_response({'count': len(results), 'data': results})
+
+
+@api.route('/venues/filter')
+@read_only
+@conditional(lambda: table_stamp(Venue))
+def filter_venues():
+    return collection(
+        filter_by_genre(Venue, request.args.get('genre', ''),
+                        request.args.get('city'), request.args.get('state')),
+        (Venue.name, Venue.id),
+        lambda row: {'id': row.id, 'name': row.name}
+    )
+
+
+@api.route('/venues/<int:venue_id>')
+@read_only
+@conditional(lambda venue_id: detail_stamp(Venue, venue_id))
+def show_venue(venue_id):
+    data = detail_with_shows(Venue, venue_id)
+
+    if data is None:
+        abort(404)
+
+    return json_response(data)
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@api.route('/artists')
+@read_only
+@conditional(lambda: table_stamp(Artist))
+def artists():
+    return collection(
+        db.session.query(Artist.id, Artist.name, Artist.city, Artist.state),
+        (Artist.name, Artist.id),
+        serialize_summary
+    )
+
+
+@api.route('/artists/search')
+@read_only
+def search_artists():
+    results = search(Artist, request.args.get('q'),
+                     request.args.get('limit', type=int))
+    return json_response({'count': len(results), 'data': results})
+
+
+@api.route('/artists/filter')
+@read_only
+@conditional(lambda: table_stamp(Artist))
+def filter_artists():
+    return collection(
+        filter_by_genre(Artist, request.args.get('genre', ''),
+                        request.args.get('city'), request.args.get('state')),
+        (Artist.name, Artist.id),
+        lambda row: {'id': row.id, 'name': row.name}
+    )
+
+
+@api.route('/artists/<int:artist_id>')
+@read_only
+@conditional(lambda artist_id: detail_stamp(Artist, artist_id))
+def show_artist(artist_id):
+    data = detail_with_shows(Artist, artist_id)
+
+    if data is None:
+        abort(404)
+
+    return json_response(data)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+@read_only
+@conditional(lambda: table_stamp(Show, Venue, Artist))
+def shows():
+    return collection(
+        Show.listing_query(),
+        (Show.start_time, Show.id),
+        Show.serialize_listing
+    )
+
+
+def parse_entries(payload):
+    """(entries, errors) from a JSON list of {artist_id, venue_id,
+    start_time} objects."""
+    if not isinstance(payload, list):
+        return [], [(None, 'Expected a list of shows.')]
+
+    entries, errors = [], []
+    for index, item in enumerate(payload):
+        try:
+            entries.append({
+                'artist_id': int(item['artist_id']),
+                'venue_id': int(item['venue_id']),
+                'start_time': parse_start_time(item['start_time']),
+            })
+        except (KeyError, TypeError, ValueError):
+            errors.append((index, 'Needs an integer artist_id and venue_id '
+                                  'and an ISO 8601 start_time without a UTC '
+                                  'offset.'))
+
+    return entries, errors
+
+
+@api.route('/shows', methods=['POST'])
+def create_shows():
+    """Book a list of shows in one transaction. With an Idempotency-Key
+    header a retried request returns the original shows (200) instead of
+    booking them again (201)."""
+    entries, errors = parse_entries(request.get_json(silent=True))
+
+    try:
+        if errors:
+            raise BookingError(errors)
+        booking = book_shows(entries, key=request.headers.get(
+            'Idempotency-Key'))
+    except BookingError as error:
+        db.session.rollback()
+        return json_response({'errors': [
+            {'index': index, 'message': message}
+            for index, message in error.errors
+        ]}, 422)
+
+    return json_response({'show_ids': booking.show_ids},
+                         200 if booking.replayed else 201)
+
+
+#  Autocomplete
+#  ----------------------------------------------------------------
+
+AUTOCOMPLETE_MODELS = {
+    'venues': Venue,
+    'artists': Artist,
+}
+
+
+@api.route('/autocomplete/<any(venues, artists):kind>')
+@read_only
+def autocomplete(kind):
+    """Venues or artists whose name starts with ?q=, for pickers."""
+    matches = complete(AUTOCOMPLETE_MODELS[kind], request.args.get('q', ''),
+                       request.args.get('limit', type=int))
+
+    response = json_response(matches)
+    response.cache_control.private = True
+    response.cache_control.max_age = \
+        current_app.config['AUTOCOMPLETE_SYNC_INTERVAL']
+    return response
+
+
+# Registered by code as well as by class: the app's own 404 and 500 pages
+# would otherwise take precedence over a blueprint's class handler.
+@api.errorhandler(HTTPException)
+@api.errorhandler(404)
+@api.errorhandler(500)
+def api_error(error):
+    return json_response({'error': error.name}, error.code)
+
+
+def is_api_path():
+    """Whether the request is under the API, matched to a view or not (an
+    unknown path or method fails before any view is chosen)."""
+    return request.path.startswith(api.url_prefix + '/')
@@ -2,91 +2,196 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-from models import db, Venue, Artist, Show
-from forms import *
-from flask_wtf import FlaskForm
+from models import db, Venue, Artist, Show, Genre, UpcomingShow, \
+    filter_by_genre, table_stamp, feed_stamp, detail_stamp, detail_with_shows
+from pagination import paginate
+from routing import read_only
+from search import search
+from cache import cache
+from conditional import conditional
+from api import api, api_error, is_api_path
+from cli import catalogue_cli, feed_cli
+from booking import book_shows, BookingError
+from internal import internal
+from profiling import profiler
+import dbpool
+import metrics
+import templating
+from forms import VenueForm, ArtistForm, ShowForm, ShowBatchForm
 from logging import Formatter, FileHandler
-from flask_migrate import Migrate
 import logging
-from flask_sqlalchemy import SQLAlchemy
-from flask_moment import Moment
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
-import babel
+from flask import Flask, Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
 import traceback
-import dateutil.parser
-import json
+import functools
+import os
+import sys
+import uuid
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db.init_app(app)
+main = Blueprint('main', __name__)
+
+
+def create_app(config=None):
+    """Build the application. `config` overrides settings read from the
+    environment by config.py.
+    """
+    app = Flask(__name__)
+    app.config.from_object('config')
+    app.config.from_mapping(config or {})
+
+    if not app.config.get('SECRET_KEY'):
+        # Enough for CLI commands and the debug server; wsgi.py refuses to
+        # serve without a shared key
+        app.config['SECRET_KEY'] = os.urandom(32)
+
+    dbpool.init_app(app)
+    db.init_app(app)
+    cache.init_app(app)
+    profiler.init_app(app)
+    metrics.init_app(app)
+    init_migrate(app)
+
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+    app.register_blueprint(internal)
+    app.cli.add_command(catalogue_cli)
+    app.cli.add_command(feed_cli)
+    app.cli.add_command(templating.templates_cli)
+    app.jinja_env.filters['datetime'] = format_datetime
+    templating.init_app(app)
+
+    if not app.debug and not app.testing:
+        file_handler = FileHandler('error.log')
+        file_handler.setFormatter(
+            Formatter(
+                '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+
+    return app
+
 
-migrate = Migrate(app, db)
+def init_migrate(app):
+    # Flask-Migrate imports all of Alembic, which only the `flask db`
+    # commands use. Those commands come from Flask-Migrate's CLI plugin, so
+    # whenever they are available it has already been imported.
+    if 'flask_migrate' in sys.modules:
+        from flask_migrate import Migrate
+
+        Migrate(app, db)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
 
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+# babel.dates itself is imported by flask_wtf, but the locale data and
+# compiled patterns are loaded on the first date rendered, and dateutil only
+# for a string value
+
+
+@functools.lru_cache(maxsize=None)
+def datetime_locale():
+    import babel.dates
+
+    return babel.Locale.parse(babel.dates.LC_TIME or 'en_US')
+
+
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format):
+    import babel.dates
+
+    if format in ('long', 'short'):
+        return None
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+
+@functools.lru_cache(maxsize=16384)
+def _format_datetime(date, format):
+    import babel.dates
+
+    pattern = datetime_pattern(format)
+
+    if pattern is None:
+        return babel.dates.format_datetime(date, format,
+                                           locale=datetime_locale())
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=babel.dates.UTC)
+
+    return pattern.apply(date, datetime_locale())
+
+
 def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+    """Format a datetime (or a string dateutil can parse) with a Babel
+    pattern. Patterns are compiled once per format and the formatted
+    output is memoized, as listings format the same start times over and
+    over.
+    """
+    if isinstance(value, str):
+        import dateutil.parser
 
+        value = dateutil.parser.parse(value)
+    return _format_datetime(value, format)
 
-app.jinja_env.filters['datetime'] = format_datetime
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 
-@ app.route('/')
+@ main.route('/')
+@read_only
+@conditional(feed_stamp)
+@cache.cached('venue', 'artist', 'show')
 def index():
-    return render_template('pages/home.html')
+    data = [Show.serialize_listing(row) for row in
+            UpcomingShow.listing_query().order_by(
+                UpcomingShow.start_time, UpcomingShow.id
+            ).limit(current_app.config['HOME_UPCOMING_SHOWS'])]
+
+    return render_template('pages/home.html', shows=data)
 
 
 #  Venues
 #  ----------------------------------------------------------------
 
-@ app.route('/venues')
+@ main.route('/venues')
+@read_only
+@conditional(lambda: table_stamp(Venue))
+@cache.cached('venue', 'show')
 def venues():
-    # Returns first Venue for each  distinct city/state
-    distinct_locations = Venue.query.distinct(Venue.city, Venue.state).all()
-
-    data = []
-
-    for location in distinct_locations:
-        d = {"city": location.city, "state": location.state}
-
-        venues_list = Venue.query.filter(
-            Venue.city == location.city,
-            Venue.state == location.state
-        ).all()
-
-        venues = [venue.serialize for venue in venues_list]
-
-        d["venues"] = venues
+    page = paginate(
+        Venue.directory_query(),
+        keys=(Venue.state, Venue.city, Venue.name, Venue.id),
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int)
+    )
 
-        data.append(d)
+    data = Venue.group_by_area(page.items)
 
-    return render_template('pages/venues.html', areas=data)
+    return render_template('pages/venues.html',
+                           areas=data,
+                           next_cursor=page.next_cursor
+                           )
 
 
-@ app.route('/venues/search', methods=['POST'])
+@ main.route('/venues/search', methods=['POST'])
+@read_only
 def search_venues():
     search_term = request.form.get('search_term')
 
-    search_results = Venue.query.filter(
-        Venue.name.ilike(f'%{search_term}%')
-    ).all()
+    search_results = search(Venue, search_term)
 
     search_count = len(search_results)
 
@@ -101,28 +206,61 @@ def search_venues():
                            )
 
 
-@app.route('/venues/<int:venue_id>')
+def describe_filter(genre, city=None, state=None):
+    location = ', '.join(part for part in (city, state) if part)
+    return f'{genre} in {location}' if location else genre
+
+
+@ main.route('/venues/filter')
+@read_only
+@cache.cached('venue')
+def filter_venues():
+    genre = request.args.get('genre', '')
+    city = request.args.get('city')
+    state = request.args.get('state')
+
+    page = paginate(
+        filter_by_genre(Venue, genre, city, state),
+        keys=(Venue.name, Venue.id),
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int)
+    )
+
+    response = {
+        "count": len(page.items),
+        "data": [{"id": v.id, "name": v.name} for v in page.items]
+    }
+
+    return render_template('pages/search_venues.html',
+                           results=response,
+                           search_term=describe_filter(genre, city, state),
+                           next_cursor=page.next_cursor
+                           )
+
+
+@ main.route('/venues/<int:venue_id>')
+@read_only
+@conditional(lambda venue_id: detail_stamp(Venue, venue_id))
+@cache.cached('venue', 'artist', 'show')
 def show_venue(venue_id):
-    venue = Venue.query.filter_by(id=venue_id).one_or_none()
+    data = detail_with_shows(Venue, venue_id)
 
-    if venue is None:
+    if data is None:
         abort(404)
 
-    data = venue.serialize_with_shows
-
     return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
 
-@ app.route('/venues/create', methods=['GET'])
+@ main.route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@ app.route('/venues/create', methods=['POST'])
+@ main.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     form = VenueForm(request.form)
 
@@ -135,7 +273,7 @@ def create_venue_submission():
             phone=form.phone.data,
             website=form.website.data,
             image_link=form.image_link.data,
-            genres=','.join(form.genres.data),
+            genres=Genre.from_names(form.genres.data),
             facebook_link=form.facebook_link.data,
             seeking_talent=form.seeking_talent.data,
             seeking_description=form.seeking_description.data
@@ -154,10 +292,14 @@ def create_venue_submission():
     return render_template('pages/home.html')
 
 
-@ app.route('/venues/<venue_id>/delete', methods=['POST'])
+@ main.route('/venues/<venue_id>/delete', methods=['POST'])
 def delete_venue(venue_id):
     try:
-        Venue.query.filter_by(id=venue_id).delete()
+        # Deleted through the session so its shows cascade with it and the
+        # upcoming feed sees them go
+        venue = Venue.query.get(venue_id)
+        if venue is not None:
+            db.session.delete(venue)
         db.session.commit()
     except:
         db.session.rollback()
@@ -170,19 +312,32 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 
 
-@ app.route('/artists')
+@ main.route('/artists')
+@read_only
+@conditional(lambda: table_stamp(Artist))
+@cache.cached('artist')
 def artists():
-    data = [{"id": a.id, "name": a.name} for a in Artist.query.all()]
-    return render_template('pages/artists.html', artists=data)
+    page = paginate(
+        db.session.query(Artist.id, Artist.name),
+        keys=(Artist.name, Artist.id),
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int)
+    )
 
+    data = [{"id": a.id, "name": a.name} for a in page.items]
 
-@ app.route('/artists/search', methods=['POST'])
+    return render_template('pages/artists.html',
+                           artists=data,
+                           next_cursor=page.next_cursor
+                           )
+
+
+@ main.route('/artists/search', methods=['POST'])
+@read_only
 def search_artists():
     search_term = request.form.get('search_term')
 
-    search_results = Artist.query.filter(
-        Artist.name.ilike(f'%{search_term}%')
-    ).all()
+    search_results = search(Artist, search_term)
 
     search_count = len(search_results)
 
@@ -192,28 +347,56 @@ def search_artists():
     }
 
     return render_template(
-        'pages/search_venues.html',
+        'pages/search_artists.html',
         results=response,
         search_term=request.form.get('search_term', '')
     )
 
 
-@ app.route('/artists/<int:artist_id>')
+@ main.route('/artists/filter')
+@read_only
+@cache.cached('artist')
+def filter_artists():
+    genre = request.args.get('genre', '')
+    city = request.args.get('city')
+    state = request.args.get('state')
+
+    page = paginate(
+        filter_by_genre(Artist, genre, city, state),
+        keys=(Artist.name, Artist.id),
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int)
+    )
+
+    response = {
+        "count": len(page.items),
+        "data": [{"id": a.id, "name": a.name} for a in page.items]
+    }
+
+    return render_template('pages/search_artists.html',
+                           results=response,
+                           search_term=describe_filter(genre, city, state),
+                           next_cursor=page.next_cursor
+                           )
+
+
+@ main.route('/artists/<int:artist_id>')
+@read_only
+@conditional(lambda artist_id: detail_stamp(Artist, artist_id))
+@cache.cached('venue', 'artist', 'show')
 def show_artist(artist_id):
-    artist = Artist.query.get(artist_id)
+    data = detail_with_shows(Artist, artist_id)
 
-    if artist is None:
+    if data is None:
         abort(404)
 
-    data = artist.serialize_with_shows
-
     return render_template('pages/show_artist.html', artist=data)
 
 #  Update
 #  ----------------------------------------------------------------
 
 
-@ app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@ main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     artist = Artist.query.get(artist_id).serialize
 
@@ -226,7 +409,7 @@ def edit_artist(artist_id):
     )
 
 
-@ app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@ main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     form = ArtistForm(request.form)
 
@@ -238,7 +421,7 @@ def edit_artist_submission(artist_id):
         artist.phone = form.phone.data
         artist.website = form.website.data
         artist.image_link = form.image_link.data
-        artist.genres = ','.join(form.genres.data)
+        artist.genres = Genre.from_names(form.genres.data)
         artist.facebook_link = form.facebook_link.data
         artist.seeking_venue = bool(form.seeking_venue.data)
         artist.seeking_description = form.seeking_description.data
@@ -254,10 +437,10 @@ def edit_artist_submission(artist_id):
     finally:
         db.session.close()
 
-    return redirect(url_for('show_artist', artist_id=artist_id))
+    return redirect(url_for('.show_artist', artist_id=artist_id))
 
 
-@ app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@ main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     venue = Venue.query.get(venue_id).serialize
     form = VenueForm(data=venue)
@@ -269,7 +452,7 @@ def edit_venue(venue_id):
     )
 
 
-@ app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@ main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     form = VenueForm(request.form)
 
@@ -281,7 +464,7 @@ def edit_venue_submission(venue_id):
         venue.phone = form.phone.data
         venue.website = form.website.data
         venue.image_link = form.image_link.data
-        venue.genres = ','.join(form.genres.data)
+        venue.genres = Genre.from_names(form.genres.data)
         venue.facebook_link = form.facebook_link.data
         venue.seeking_talent = form.seeking_talent.data
         venue.seeking_description = form.seeking_description.data
@@ -297,19 +480,19 @@ def edit_venue_submission(venue_id):
     finally:
         db.session.close()
 
-    return redirect(url_for('show_venue', venue_id=venue_id))
+    return redirect(url_for('.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
 
-@ app.route('/artists/create', methods=['GET'])
+@ main.route('/artists/create', methods=['GET'])
 def create_artist_form():
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@ app.route('/artists/create', methods=['POST'])
+@ main.route('/artists/create', methods=['POST'])
 def create_artist_submission():
     form = ArtistForm(request.form)
 
@@ -321,7 +504,7 @@ def create_artist_submission():
             phone=form.phone.data,
             website=form.website.data,
             image_link=form.image_link.data,
-            genres=','.join(form.genres.data),
+            genres=Genre.from_names(form.genres.data),
             facebook_link=form.facebook_link.data,
             seeking_venue=form.seeking_venue.data,
             seeking_description=form.seeking_description.data
@@ -343,34 +526,53 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 
-@ app.route('/shows')
+@ main.route('/shows')
+@read_only
+@conditional(feed_stamp)
+@cache.cached('venue', 'artist', 'show')
 def shows():
-    data = [show.serialize for show in Show.query.all()]
+    page = paginate(
+        UpcomingShow.listing_query(),
+        keys=(UpcomingShow.start_time, UpcomingShow.id),
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int)
+    )
+
+    data = [Show.serialize_listing(row) for row in page.items]
 
-    return render_template('pages/shows.html', shows=data)
+    return render_template('pages/shows.html',
+                           shows=data,
+                           next_cursor=page.next_cursor
+                           )
 
 
-@ app.route('/shows/create')
+def flash_errors(form):
+    for name, messages in form.errors.items():
+        flash(f'Error: {name}: {messages}')
+
+
+@ main.route('/shows/create')
 def create_shows():
-    # renders form. do not touch.
-    form = ShowForm()
+    # A fresh idempotency key per render, so a resubmitted form books once
+    form = ShowForm(idempotency_key=uuid.uuid4().hex)
     return render_template('forms/new_show.html', form=form)
 
 
-@ app.route('/shows/create', methods=['POST'])
+@ main.route('/shows/create', methods=['POST'])
 def create_show_submission():
     form = ShowForm(request.form)
 
-    try:
-        new_show = Show(
-            artist_id=form.artist_id.data,
-            venue_id=form.venue_id.data,
-            start_time=form.start_time.data
-        )
-        db.session.add(new_show)
-        db.session.commit()
+    if not form.validate():
+        flash_errors(form)
+        return render_template('forms/new_show.html', form=form), 400
 
+    try:
+        book_shows([form.data], key=form.idempotency_key.data)
         flash('Show was successfully listed!')
+    except BookingError as error:
+        db.session.rollback()
+        flash('Error: Show could not be added! ' + str(error))
+        return render_template('forms/new_show.html', form=form), 409
     except:
         db.session.rollback()
         flash('Error: Show could not be added!')
@@ -381,38 +583,77 @@ def create_show_submission():
     return render_template('pages/home.html')
 
 
-@ app.errorhandler(404)
+@ main.route('/shows/batch')
+def create_show_batch():
+    rows = min(request.args.get('rows', 5, type=int),
+               current_app.config['MAX_SHOWS_PER_BOOKING'])
+    form = ShowBatchForm(idempotency_key=uuid.uuid4().hex)
+    while len(form.shows) < rows:
+        form.shows.append_entry()
+    return render_template('forms/new_shows.html', form=form)
+
+
+@ main.route('/shows/batch', methods=['POST'])
+def create_show_batch_submission():
+    form = ShowBatchForm(request.form)
+
+    if not form.validate():
+        flash_errors(form)
+        return render_template('forms/new_shows.html', form=form), 400
+
+    try:
+        booking = book_shows(form.shows.data, key=form.idempotency_key.data)
+        flash(f'{len(booking.show_ids)} shows were successfully listed!')
+    except BookingError as error:
+        db.session.rollback()
+        for index, message in error.errors:
+            if index is None:
+                flash('Error: ' + message)
+            else:
+                flash(f'Error in show {index + 1}: {message}')
+        return render_template('forms/new_shows.html', form=form), 409
+    except:
+        db.session.rollback()
+        flash('Error: Shows could not be added!')
+        traceback.print_exc()
+    finally:
+        db.session.close()
+
+    return render_template('pages/home.html')
+
+
+@ main.app_errorhandler(404)
 def not_found_error(error):
+    if is_api_path():
+        return api_error(error)
     return render_template('errors/404.html'), 404
 
 
-@ app.errorhandler(500)
+@ main.app_errorhandler(405)
+def method_not_allowed_error(error):
+    if is_api_path():
+        return api_error(error)
+    return error
+
+
+@ main.app_errorhandler(500)
 def server_error(error):
+    if is_api_path():
+        return api_error(error)
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
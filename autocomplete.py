@@ -0,0 +1,265 @@
+import bisect
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from models import db, Venue, Artist, TableVersion, VERSIONED_TABLES, \
+    on_commit
+
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#----------------------------------------------------------------------------#
+
+# Venue and artist names are completed from an in-process prefix index: a
+# sorted list of (normalized name, id) pairs, where every name starting with
+# a prefix sits in one contiguous run found by binary search. A lookup costs
+# O(log n + limit) whatever the catalogue size, and the list is far smaller
+# than a character trie over the same names.
+#
+# Each index is loaded on first use and kept current from ORM commits in this
+# process. Writes made by other workers are noticed through the table's
+# TableVersion counter, a primary key lookup made at most every
+# AUTOCOMPLETE_SYNC_INTERVAL seconds. When it has moved, a background thread
+# re-reads the names and applies the difference, while requests keep
+# completing from the index as it is. Re-sorting a million names takes
+# seconds, so the index is only rebuilt when most of it has changed.
+
+
+def normalize(name):
+    return ' '.join((name or '').casefold().split())
+
+
+class PrefixIndex:
+
+    def __init__(self):
+        self.entries = []
+        self.keys = {}
+        self.names = {}
+
+    def build(self, rows):
+        """Replace the contents with (id, name) `rows`, sorting once."""
+        self.names = dict(rows)
+        self.keys = {doc_id: (normalize(name), doc_id)
+                     for doc_id, name in self.names.items()}
+        self.entries = sorted(self.keys.values())
+
+    def add(self, doc_id, name):
+        self.remove(doc_id)
+
+        entry = (normalize(name), doc_id)
+        bisect.insort(self.entries, entry)
+        self.keys[doc_id] = entry
+        self.names[doc_id] = name
+
+    def remove(self, doc_id):
+        entry = self.keys.pop(doc_id, None)
+
+        if entry is None:
+            return
+
+        del self.entries[bisect.bisect_left(self.entries, entry)]
+        del self.names[doc_id]
+
+    def complete(self, prefix, limit):
+        """(id, name) pairs whose normalized name starts with `prefix`, in
+        name order."""
+        prefix = normalize(prefix)
+        matches = []
+
+        if not prefix:
+            return matches
+
+        for position in range(bisect.bisect_left(self.entries, (prefix,)),
+                              len(self.entries)):
+            key, doc_id = self.entries[position]
+
+            if not key.startswith(prefix) or len(matches) == limit:
+                break
+            matches.append((doc_id, self.names[doc_id]))
+
+        return matches
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SyncedIndex:
+    """A model's PrefixIndex plus the TableVersion counter it was synced at.
+
+    The lock only guards the in-memory list and is never held across a
+    query: locks created before gevent patches the stdlib would block the
+    whole worker while a greenlet waits on the database.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+        self.synced_at = time.monotonic()
+        self.refreshing = None
+        self.applied = set()
+
+        self.version, rows = self.load()
+        self.index = PrefixIndex()
+        self.index.build(rows.items())
+
+    def load(self):
+        # The counter is read first: a commit landing between the two
+        # queries leaves it behind the rows, costing one more refresh
+        # rather than a missed write
+        version = _table_version(self.model)
+        rows = dict(db.session.query(self.model.id, self.model.name))
+        return version, rows
+
+    def sync(self, interval):
+        """Start a refresh if other processes have written to the table,
+        checking at most once per `interval` seconds."""
+        with self.lock:
+            if self.refreshing is not None or \
+                    time.monotonic() - self.synced_at < interval:
+                return
+            # Claim the check so concurrent requests use the index as it is
+            self.synced_at = time.monotonic()
+            version = self.version
+
+        if _table_version(self.model) == version:
+            return
+
+        with self.lock:
+            if self.refreshing is not None:
+                return
+            self.refreshing = threading.Thread(
+                target=self.refresh,
+                args=(current_app._get_current_object(),),
+                daemon=True)
+        self.refreshing.start()
+
+    def refresh(self, app):
+        try:
+            with app.app_context():
+                version, rows = self.load()
+
+            with self.lock:
+                names = dict(self.index.names)
+
+            changed = [(doc_id, name) for doc_id, name in rows.items()
+                       if names.get(doc_id) != name]
+            removed = names.keys() - rows.keys()
+
+            if 2 * (len(changed) + len(removed)) > len(rows):
+                index = PrefixIndex()
+                index.build(rows.items())
+            else:
+                index = None
+
+            with self.lock:
+                # Commits this process applied meanwhile are newer than
+                # `rows`
+                if index is None:
+                    for doc_id in removed - self.applied:
+                        self.index.remove(doc_id)
+                    for doc_id, name in changed:
+                        if doc_id not in self.applied:
+                            self.index.add(doc_id, name)
+                else:
+                    for doc_id in self.applied:
+                        if doc_id in self.index.names:
+                            index.add(doc_id, self.index.names[doc_id])
+                        else:
+                            index.remove(doc_id)
+                    self.index = index
+                self.version = version
+        except Exception:
+            app.logger.exception('could not refresh the %s autocomplete index',
+                                 self.model.__tablename__)
+        finally:
+            with self.lock:
+                self.synced_at = time.monotonic()
+                self.refreshing = None
+                self.applied = set()
+
+    def apply(self, doc_id, name):
+        """Apply a change committed by this process; None removes."""
+        with self.lock:
+            if name is None:
+                self.index.remove(doc_id)
+            else:
+                self.index.add(doc_id, name)
+            if self.refreshing is not None:
+                self.applied.add(doc_id)
+
+
+def _table_version(model):
+    return db.session.query(TableVersion.version).filter(
+        TableVersion.name == VERSIONED_TABLES[model]
+    ).scalar()
+
+
+def _indexes():
+    # Per app, so an index never outlives the database it was built from
+    return current_app.extensions.setdefault('autocomplete_indexes', {})
+
+
+def _synced_index(model):
+    indexes = _indexes()
+    synced = indexes.get(model)
+
+    if synced is None:
+        synced = indexes[model] = SyncedIndex(model)
+    else:
+        synced.sync(current_app.config['AUTOCOMPLETE_SYNC_INTERVAL'])
+
+    return synced
+
+
+def complete(model, prefix, limit=None):
+    """Up to `limit` {'id', 'name'} dicts of `model` whose name starts with
+    `prefix`. `limit` is clamped to [1, AUTOCOMPLETE_MAX_LIMIT]."""
+    limit = max(1, min(limit or current_app.config['AUTOCOMPLETE_LIMIT'],
+                       current_app.config['AUTOCOMPLETE_MAX_LIMIT']))
+
+    if not normalize(prefix):
+        return []
+
+    synced = _synced_index(model)
+    with synced.lock:
+        matches = synced.index.complete(prefix, limit)
+
+    return [{'id': doc_id, 'name': name} for doc_id, name in matches]
+
+
+def warm(app):
+    """Build every index now rather than on the first keystroke."""
+    with app.app_context():
+        for model in (Venue, Artist):
+            _synced_index(model)
+
+
+def _apply_autocomplete_changes(changes, reloaded):
+    if not has_app_context():
+        return
+
+    indexes = _indexes()
+    for model in reloaded:
+        indexes.pop(model, None)
+
+    for (model, doc_id), name in changes.items():
+        synced = indexes.get(model)
+
+        if synced is not None:
+            synced.apply(doc_id, name)
+
+
+on_commit((Venue, Artist), _apply_autocomplete_changes,
+          snapshot=lambda obj: obj.name)
+
+
+@event.listens_for(Venue.__table__, 'after_create')
+@event.listens_for(Venue.__table__, 'after_drop')
+@event.listens_for(Artist.__table__, 'after_create')
+@event.listens_for(Artist.__table__, 'after_drop')
+def _reset_indexes(target, connection, **kw):
+    if has_app_context():
+        model = Venue if target is Venue.__table__ else Artist
+        _indexes().pop(model, None)
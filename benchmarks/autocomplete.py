@@ -0,0 +1,70 @@
+"""Autocomplete lookup latency at catalogue scale.
+
+Fills a PrefixIndex with --names synthetic names shaped like the seeded
+catalogue, then times lookups for prefixes of one to four characters taken
+from real names, plus single updates as made on create/edit/delete.
+
+    python -m benchmarks.autocomplete --names 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from autocomplete import PrefixIndex
+from benchmarks.seed import ADJECTIVES, BAND_NOUNS, FIRST_NAMES, \
+    LAST_NAMES, NOUNS
+
+
+def _names(count, rng):
+    for n in range(count):
+        if rng.random() < 0.5:
+            yield n, f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {n}'
+        else:
+            yield n, f'The {rng.choice(ADJECTIVES)} ' \
+                f'{rng.choice(NOUNS + BAND_NOUNS)} {n}'
+
+
+def _timed(calls):
+    timings = []
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {'p50_ms': statistics.median(timings),
+            'p99_ms': timings[int(0.99 * (len(timings) - 1))],
+            'max_ms': timings[-1],
+            }
+
+
+def benchmark(names, lookups, limit):
+    rng = random.Random(0)
+    index = PrefixIndex()
+
+    started = time.perf_counter()
+    index.build(list(_names(names, rng)))
+    print(f'built {len(index)} names in {time.perf_counter() - started:.2f}s')
+
+    samples = rng.sample(list(index.names.values()), lookups)
+    for length in (1, 2, 3, 4):
+        stats = _timed(lambda name=name: index.complete(name[:length], limit)
+                       for name in samples)
+        print(f'prefix of {length}: p50 {stats["p50_ms"]:.3f}ms, '
+              f'p99 {stats["p99_ms"]:.3f}ms, max {stats["max_ms"]:.3f}ms')
+
+    ids = rng.sample(range(names), lookups)
+    stats = _timed(lambda doc_id=doc_id: index.add(doc_id, f'Renamed {doc_id}')
+                   for doc_id in ids)
+    print(f'update: p50 {stats["p50_ms"]:.3f}ms, '
+          f'p99 {stats["p99_ms"]:.3f}ms, max {stats["max_ms"]:.3f}ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--names', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    benchmark(args.names, args.lookups, args.limit)
@@ -0,0 +1,59 @@
+"""Per-row cost of the `datetime` template filter on 10k shows.
+
+Compares the old path (strftime in the serializer, dateutil re-parse and
+babel.dates.format_datetime per row) with the current filter, on a first
+render (nothing memoized) and a repeat render.
+
+    python -m benchmarks.datetime_filter --shows 10000
+"""
+import argparse
+import datetime
+import random
+import time
+
+import babel.dates
+import dateutil.parser
+
+import app
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def _per_row_us(fn, values):
+    started = time.perf_counter()
+    for value in values:
+        fn(value, 'full')
+    return (time.perf_counter() - started) / len(values) * 1e6
+
+
+def benchmark(shows):
+    rng = random.Random(0)
+    now = datetime.datetime.now().replace(second=0, microsecond=0)
+    start_times = [now + datetime.timedelta(minutes=30 * rng.randint(
+        -20000, 20000)) for _ in range(shows)]
+    serialized = [t.strftime("%m/%d/%Y, %H:%M:%S") for t in start_times]
+
+    legacy = _per_row_us(legacy_format_datetime, serialized)
+    app._format_datetime.cache_clear()
+    first = _per_row_us(app.format_datetime, start_times)
+    repeat = _per_row_us(app.format_datetime, start_times)
+
+    print(f'{shows} shows, per row:')
+    print(f'  before (parse + format):  {legacy:8.2f}us')
+    print(f'  after, first render:      {first:8.2f}us')
+    print(f'  after, repeat render:     {repeat:8.2f}us')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shows', type=int, default=10000)
+    args = parser.parse_args()
+
+    benchmark(args.shows)
@@ -0,0 +1,105 @@
+"""Detail-page query plans and latencies with and without the show indexes.
+
+Seeds a synthetic catalogue (unless --no-seed), then for a sample of venues
+and artists reports the plan of the shows query and the time taken by
+detail_with_shows, first with ix_shows_venue_id_start_time and
+ix_shows_artist_id_start_time dropped, then with them in place.
+
+    python -m benchmarks.detail_queries --shows 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app import create_app
+from benchmarks.seed import seed
+from models import db, Venue, Artist, Show, detail_with_shows
+
+INDEXES = ('ix_shows_venue_id_start_time', 'ix_shows_artist_id_start_time')
+
+
+def _indexes():
+    return [i for i in Show.__table__.indexes if i.name in INDEXES]
+
+
+def _explain(query):
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+
+    if compiled.positional:
+        params = [compiled.params[name] for name in compiled.positiontup]
+    else:
+        params = compiled.params
+
+    if db.engine.dialect.name == 'postgresql':
+        prefix = 'EXPLAIN ANALYZE '
+    else:
+        prefix = 'EXPLAIN QUERY PLAN '
+
+    rows = db.engine.execute(prefix + str(compiled), params)
+    return '\n'.join(' '.join(str(col) for col in row) for row in rows)
+
+
+def _run(model, column, ids):
+    timings = []
+
+    for entity_id in ids:
+        started = time.perf_counter()
+        detail_with_shows(model, entity_id)
+        timings.append((time.perf_counter() - started) * 1000)
+        db.session.remove()
+
+    plan = _explain(Show.listing_query().filter(column == ids[0]))
+
+    return {'p50_ms': statistics.median(timings),
+            'max_ms': max(timings),
+            'plan': plan,
+            }
+
+
+def _report(label, results):
+    print(f'== {label}')
+    for name, result in results.items():
+        print(f'-- {name}: p50 {result["p50_ms"]:.2f}ms, '
+              f'max {result["max_ms"]:.2f}ms')
+        print(result['plan'])
+
+
+def benchmark(samples):
+    rng = random.Random(0)
+    venue_ids = rng.sample([v.id for v in db.session.query(Venue.id)],
+                           samples)
+    artist_ids = rng.sample([a.id for a in db.session.query(Artist.id)],
+                            samples)
+    results = {}
+
+    for label, create in (('without indexes', False), ('with indexes', True)):
+        for index in _indexes():
+            if create:
+                index.create(bind=db.engine)
+            else:
+                index.drop(bind=db.engine)
+
+        results[label] = {
+            'venue': _run(Venue, Show.venue_id, venue_ids),
+            'artist': _run(Artist, Show.artist_id, artist_ids),
+        }
+        _report(label, results[label])
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=1000)
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--samples', type=int, default=50)
+    parser.add_argument('--no-seed', action='store_true')
+    args = parser.parse_args()
+
+    # Sessions are never used here, so any key will do
+    with create_app({'SECRET_KEY': 'benchmarks'}).app_context():
+        if not args.no_seed:
+            seed(args.venues, args.artists, args.shows)
+        benchmark(args.samples)
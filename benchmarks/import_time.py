@@ -0,0 +1,112 @@
+"""Cold-start cost of importing the app, as a new worker or CLI command pays.
+
+Runs each entry point in a fresh interpreter under `python -X importtime`
+and reports the wall time (median of --runs) and the modules whose imports
+cost the most, counting each top-level package once with everything it
+pulled in.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --top 25 --output before.json
+    python -m benchmarks.import_time --compare before.json
+"""
+import argparse
+import collections
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ENTRY_POINTS = {
+    # What a gunicorn worker loads
+    'wsgi': 'import wsgi',
+    # What every `flask ...` command loads before running
+    'create_app': 'from app import create_app; create_app()',
+    'import app': 'import app',
+}
+
+
+def importtime(code):
+    """(wall seconds, [(module, self us, cumulative us, depth)])."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        env=dict(os.environ, SECRET_KEY='benchmarks'),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+    wall = time.perf_counter() - started
+
+    modules = []
+    for line in result.stderr.decode().splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us),
+                        depth))
+
+    return wall, modules
+
+
+def by_package(modules):
+    """Total self time per top-level package, in microseconds."""
+    totals = collections.Counter()
+    for name, self_us, _, _ in modules:
+        totals[name.split('.')[0]] += self_us
+    return totals
+
+
+def benchmark(runs, top):
+    results = {}
+
+    for label, code in ENTRY_POINTS.items():
+        walls, packages = [], collections.Counter()
+
+        for _ in range(runs):
+            wall, modules = importtime(code)
+            walls.append(wall * 1000)
+            packages.update(by_package(modules))
+
+        results[label] = {
+            'wall_ms': round(statistics.median(walls), 1),
+            'import_ms': round(sum(packages.values()) / runs / 1000, 1),
+            'modules': len(modules),
+            'packages': {name: round(us / runs / 1000, 2)
+                         for name, us in packages.most_common(top)},
+        }
+
+    return results
+
+
+def print_report(results, baseline=None):
+    for label, result in results.items():
+        line = (f'{label:12} wall {result["wall_ms"]:7.1f}ms  '
+                f'imports {result["import_ms"]:7.1f}ms  '
+                f'{result["modules"]} modules')
+        old = (baseline or {}).get(label)
+        if old:
+            line += f'  wall {result["wall_ms"] / old["wall_ms"] - 1:+.0%}'
+        print(line, file=sys.stderr)
+
+    label = next(iter(results))
+    print(f'\nslowest packages for {label}:', file=sys.stderr)
+    for name, ms in results[label]['packages'].items():
+        print(f'  {name:28} {ms:7.2f}ms', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--output', type=argparse.FileType('w'))
+    parser.add_argument('--compare', type=argparse.FileType('r'),
+                        help='earlier --output to compare against')
+    args = parser.parse_args()
+
+    results = benchmark(args.runs, args.top)
+    print_report(results, json.load(args.compare) if args.compare else None)
+
+    if args.output:
+        json.dump(results, args.output, indent=2)
+        args.output.write('\n')
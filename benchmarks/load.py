@@ -0,0 +1,389 @@
+"""Load test every page in app.py with concurrent clients.
+
+Builds one request per route from ids sampled out of the database, then
+has --clients threads cycle through them for --duration seconds after a
+--warmup, every route getting an equal share. Reports per-route and
+overall p50/p95/p99 latency, throughput and queries per request (read from
+the Server-Timing header) as JSON, so two runs can be compared:
+
+    python -m benchmarks.seed --scale 1m
+    python -m benchmarks.load --serve --output before.json
+    ... change something ...
+    python -m benchmarks.load --serve --compare before.json
+
+--serve starts gunicorn on --port; otherwise --url points at a running
+server using the same DATABASE_URL, started with PROFILE_REQUESTS=true for
+the query counts. Write routes mutate the catalogue, so they only run with
+--writes.
+"""
+import argparse
+import collections
+import datetime
+import http.client
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+from app import create_app
+from models import db, Venue, Artist, Show, Genre
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+Request = collections.namedtuple(
+    'Request', ['endpoint', 'method', 'path', 'form', 'json'],
+    defaults=[None, None])
+
+
+def GET(endpoint, path):
+    return Request(endpoint, 'GET', path)
+
+
+def POST(endpoint, path, form):
+    return Request(endpoint, 'POST', path, form)
+
+
+def POST_JSON(endpoint, path, json):
+    return Request(endpoint, 'POST', path, json=json)
+
+
+#----------------------------------------------------------------------------#
+# Requests.
+#----------------------------------------------------------------------------#
+
+
+def build_requests(app, sample, writes):
+    with app.app_context():
+        venues = Venue.query.limit(sample).all()
+        artists = Artist.query.limit(sample).all()
+        genre = db.session.query(Genre.name).order_by(Genre.id).limit(1).scalar()
+        venue, artist = venues[0].serialize, artists[0].serialize
+
+        requests = [
+            GET('main.index', '/'),
+            GET('main.venues', '/venues'),
+            GET('main.artists', '/artists'),
+            GET('main.shows', '/shows'),
+            GET('main.filter_venues', '/venues/filter?' +
+                urllib.parse.urlencode({'genre': genre,
+                                        'state': venue['state']})),
+            GET('main.filter_artists', '/artists/filter?' +
+                urllib.parse.urlencode({'genre': genre})),
+            POST('main.search_venues', '/venues/search',
+                 {'search_term': venue['name'].split()[1]}),
+            POST('main.search_artists', '/artists/search',
+                 {'search_term': artist['name'].split()[1]}),
+            GET('main.create_venue_form', '/venues/create'),
+            GET('main.create_artist_form', '/artists/create'),
+            GET('main.create_shows', '/shows/create'),
+            GET('main.create_show_batch', '/shows/batch'),
+        ]
+        requests += [GET('main.show_venue', f'/venues/{v.id}')
+                     for v in venues]
+        requests += [GET('main.show_artist', f'/artists/{a.id}')
+                     for a in artists]
+        requests += [GET('main.edit_venue', f'/venues/{v.id}/edit')
+                     for v in venues[:5]]
+        requests += [GET('main.edit_artist', f'/artists/{a.id}/edit')
+                     for a in artists[:5]]
+
+        if writes:
+            requests += write_requests(venue, artist)
+
+        endpoints = {rule.endpoint for rule in app.url_map.iter_rules()
+                     if rule.endpoint.startswith('main.')}
+
+    missing = endpoints - {request.endpoint for request in requests}
+    if missing:
+        print(f'not exercised: {", ".join(sorted(missing))}',
+              file=sys.stderr)
+
+    return requests
+
+
+def write_requests(venue, artist):
+    def form(entity, *fields):
+        data = {field: entity[field] or '' for field in fields}
+        data['genres'] = entity['genres']
+        return data
+
+    venue_form = form(venue, 'name', 'city', 'state', 'address', 'phone',
+                      'website', 'image_link', 'facebook_link',
+                      'seeking_description')
+    artist_form = form(artist, 'name', 'city', 'state', 'phone', 'website',
+                       'image_link', 'facebook_link', 'seeking_description')
+    start_time = datetime.datetime.now() + datetime.timedelta(days=30)
+
+    return [
+        POST('main.create_venue_submission', '/venues/create', venue_form),
+        POST('main.create_artist_submission', '/artists/create',
+             artist_form),
+        # The show forms need a CSRF token, so shows are booked through the
+        # API; every request books a new slot
+        POST_JSON('api.create_shows', '/api/v1/shows', lambda n: [
+            {'artist_id': artist['id'], 'venue_id': venue['id'],
+             'start_time': (start_time + datetime.timedelta(
+                 minutes=n)).isoformat()}]),
+        POST('main.edit_venue_submission', f'/venues/{venue["id"]}/edit',
+             venue_form),
+        POST('main.edit_artist_submission', f'/artists/{artist["id"]}/edit',
+             artist_form),
+        # No such venue: exercises the route without eating the catalogue
+        POST('main.delete_venue', '/venues/0/delete', {}),
+    ]
+
+
+#----------------------------------------------------------------------------#
+# Driver.
+#----------------------------------------------------------------------------#
+
+
+class Client:
+    """One keep-alive connection issuing requests in turn."""
+
+    # Numbers requests whose JSON body is built per request
+    counter = itertools.count()
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.connection = None
+
+    def send(self, request):
+        """Returns (status, seconds, queries or None)."""
+        body, headers = None, {}
+
+        if request.form is not None:
+            body = urllib.parse.urlencode(request.form, doseq=True)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif request.json is not None:
+            body = json.dumps(request.json(next(self.counter))
+                              if callable(request.json) else request.json)
+            headers['Content-Type'] = 'application/json'
+
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=60)
+
+        started = time.perf_counter()
+        try:
+            self.connection.request(request.method, request.path, body,
+                                    headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            return None, time.perf_counter() - started, None
+        elapsed = time.perf_counter() - started
+
+        match = SERVER_TIMING_QUERIES.search(
+            response.getheader('Server-Timing', ''))
+
+        return response.status, elapsed, match and int(match.group(1))
+
+
+def drive(url, requests, clients, duration):
+    """Replay `requests` from `clients` threads for `duration` seconds,
+    giving every endpoint an equal share. Returns {endpoint: [(status,
+    seconds, queries), ...]}."""
+    parsed = urllib.parse.urlsplit(url)
+    deadline = time.perf_counter() + duration
+    results = collections.defaultdict(list)
+    lock = threading.Lock()
+
+    by_endpoint = collections.defaultdict(list)
+    for request in requests:
+        by_endpoint[request.endpoint].append(request)
+
+    def run(offset):
+        client = Client(parsed.hostname, parsed.port or 80)
+        samples = collections.defaultdict(list)
+        # Each client walks the endpoints, and each endpoint's requests,
+        # from its own starting point
+        endpoints = itertools.cycle(
+            [itertools.islice(itertools.cycle(group), offset, None)
+             for group in by_endpoint.values()])
+
+        for group in itertools.islice(endpoints, offset, None):
+            if time.perf_counter() >= deadline:
+                break
+            request = next(group)
+            samples[request.endpoint].append(client.send(request))
+
+        with lock:
+            for endpoint, values in samples.items():
+                results[endpoint].extend(values)
+
+    threads = [threading.Thread(target=run, args=(offset,))
+               for offset in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def start_server(port, env=None, workers=4):
+    """Start gunicorn serving wsgi:app and wait until it answers."""
+    env = dict(os.environ,
+               PORT=str(port),
+               WEB_CONCURRENCY=str(workers),
+               SECRET_KEY=os.environ.get('SECRET_KEY', 'benchmarks'),
+               PROFILE_REQUESTS=os.environ.get('PROFILE_REQUESTS', 'true'),
+               **(env or {}))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--access-logfile', '/dev/null', 'wsgi:app'],
+        env=env, stderr=subprocess.DEVNULL)
+
+    client = Client('127.0.0.1', port)
+    for _ in range(100):
+        if client.send(GET('main.index', '/'))[0] is not None:
+            return server
+        time.sleep(0.1)
+
+    server.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+#----------------------------------------------------------------------------#
+# Report.
+#----------------------------------------------------------------------------#
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(samples, duration):
+    latencies = sorted(seconds * 1000 for status, seconds, _ in samples
+                       if status is not None and status < 500)
+    queries = [count for status, _, count in samples if count is not None]
+
+    return {'requests': len(samples),
+            'errors': len(samples) - len(latencies),
+            'throughput_rps': round(len(latencies) / duration, 1),
+            'p50_ms': _round(percentile(latencies, .50)),
+            'p95_ms': _round(percentile(latencies, .95)),
+            'p99_ms': _round(percentile(latencies, .99)),
+            'queries_per_request': _round(
+                sum(queries) / len(queries) if queries else None),
+            }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def report(results, duration, metadata):
+    return dict(metadata,
+                overall=summarize(
+                    [s for samples in results.values() for s in samples],
+                    duration),
+                routes={endpoint: summarize(samples, duration)
+                        for endpoint, samples in sorted(results.items())})
+
+
+def print_table(run, baseline=None):
+    rows = [('overall', run['overall'])] + list(run['routes'].items())
+    before = {} if baseline is None else \
+        dict([('overall', baseline['overall'])] +
+             list(baseline['routes'].items()))
+
+    print(f'{"route":32} {"req/s":>8} {"p50":>8} {"p95":>8} {"p99":>8} '
+          f'{"queries":>8} {"errors":>7}', file=sys.stderr)
+
+    for name, stats in rows:
+        line = (f'{name:32} {stats["throughput_rps"]:8.1f} '
+                f'{stats["p50_ms"] or 0:8.2f} {stats["p95_ms"] or 0:8.2f} '
+                f'{stats["p99_ms"] or 0:8.2f} '
+                f'{stats["queries_per_request"] or 0:8.1f} '
+                f'{stats["errors"]:7d}')
+
+        old = before.get(name)
+        if old and old['p95_ms'] and stats['p95_ms']:
+            line += f'  p95 {stats["p95_ms"] / old["p95_ms"] - 1:+.0%}'
+        if old and old['throughput_rps']:
+            line += (f'  req/s '
+                     f'{stats["throughput_rps"] / old["throughput_rps"] - 1:+.0%}')
+
+        print(line, file=sys.stderr)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5050')
+    parser.add_argument('--serve', action='store_true',
+                        help='start gunicorn on --port for the run')
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--sample', type=int, default=50,
+                        help='venues and artists whose pages are requested')
+    parser.add_argument('--writes', action='store_true',
+                        help='include the create/edit/delete routes')
+    parser.add_argument('--output', type=argparse.FileType('w'),
+                        default=sys.stdout)
+    parser.add_argument('--compare', type=argparse.FileType('r'),
+                        help='earlier --output to compare against')
+    args = parser.parse_args()
+
+    # Sessions are never used here, so any key will do
+    app = create_app({'SECRET_KEY': 'benchmarks'})
+    requests = build_requests(app, args.sample, args.writes)
+
+    with app.app_context():
+        dataset = {model.__tablename__: db.session.query(
+            db.func.count(model.id)).scalar()
+            for model in (Venue, Artist, Show)}
+
+    url = f'http://127.0.0.1:{args.port}' if args.serve else args.url
+    server = start_server(args.port, workers=args.workers) \
+        if args.serve else None
+
+    try:
+        if args.warmup:
+            drive(url, requests, args.clients, args.warmup)
+        results = drive(url, requests, args.clients, args.duration)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    run = report(results, args.duration, {
+        'revision': git_revision(),
+        'started_at': datetime.datetime.utcnow().isoformat() + 'Z',
+        'clients': args.clients,
+        'duration_s': args.duration,
+        'workers': args.workers if args.serve else None,
+        'writes': args.writes,
+        'dataset': dataset,
+    })
+
+    print_table(run, json.load(args.compare) if args.compare else None)
+    json.dump(run, args.output, indent=2)
+    args.output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
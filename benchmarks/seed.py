@@ -0,0 +1,276 @@
+"""Synthetic catalogue data for benchmarks.
+
+Generates venues, artists and shows shaped like a real catalogue: venues
+cluster in a few dozen cities, a handful of popular venues and artists
+carry most of the shows, and shows start in the evening, spread over two
+years either side of today. The same --seed always produces the same data.
+
+    python -m benchmarks.seed --scale 1m
+    python -m benchmarks.seed --venues 1000 --artists 5000 --shows 1000000
+
+Scales run from 1k to 10m shows; venue and artist counts follow unless
+given explicitly. Rows go in through COPY on PostgreSQL.
+"""
+import argparse
+import array
+import collections
+import datetime
+import itertools
+import random
+import time
+
+from app import create_app
+from cli import insert_rows
+from forms import GENRE_CHOICES
+import feed
+from models import db, Venue, Artist, Show, Genre, UpcomingShow, \
+    venue_genres, artist_genres, VERSIONED_TABLES, bump_table_versions
+
+GENRES = [choice for choice, _ in GENRE_CHOICES]
+
+# shows: (venues, artists)
+SCALES = {
+    '1k': (1000, (20, 100)),
+    '10k': (10000, (100, 500)),
+    '100k': (100000, (500, 2500)),
+    '1m': (1000000, (2000, 10000)),
+    '10m': (10000000, (10000, 50000)),
+}
+
+CITIES = [
+    ('New York', 'NY'), ('Brooklyn', 'NY'), ('Los Angeles', 'CA'),
+    ('San Francisco', 'CA'), ('Oakland', 'CA'), ('San Diego', 'CA'),
+    ('Chicago', 'IL'), ('Houston', 'TX'), ('Austin', 'TX'),
+    ('Dallas', 'TX'), ('Phoenix', 'AZ'), ('Philadelphia', 'PA'),
+    ('Pittsburgh', 'PA'), ('Seattle', 'WA'), ('Portland', 'OR'),
+    ('Denver', 'CO'), ('Boston', 'MA'), ('Nashville', 'TN'),
+    ('Memphis', 'TN'), ('New Orleans', 'LA'), ('Atlanta', 'GA'),
+    ('Miami', 'FL'), ('Detroit', 'MI'), ('Minneapolis', 'MN'),
+    ('Kansas City', 'MO'), ('St. Louis', 'MO'), ('Las Vegas', 'NV'),
+    ('Salt Lake City', 'UT'), ('Washington', 'DC'), ('Baltimore', 'MD'),
+]
+# Bigger cities host more of everything
+_CITY_WEIGHTS = [1 / (rank + 1) for rank in range(len(CITIES))]
+
+ADJECTIVES = ['Blue', 'Red', 'Golden', 'Silver', 'Velvet', 'Electric',
+              'Midnight', 'Lucky', 'Crooked', 'Little', 'Grand', 'Old',
+              'Wild', 'Black', 'Neon', 'Rusty', 'Broken', 'Dueling']
+NOUNS = ['Room', 'Lounge', 'Hall', 'Tavern', 'Theatre', 'Garage', 'Barn',
+         'Cellar', 'Parlor', 'Ballroom', 'Warehouse', 'Club', 'Pianos',
+         'Owl', 'Fox', 'Anchor', 'Lantern', 'Crow']
+STREETS = ['Main St', 'Market St', 'Broadway', '1st Ave', 'Mission St',
+           'Elm St', 'Oak Ave', 'Sunset Blvd', 'Bourbon St', 'Beale St']
+FIRST_NAMES = ['Matt', 'Ana', 'Jo', 'Sam', 'Lee', 'Kai', 'Rosa', 'Nina',
+               'Otis', 'Ruth', 'Ike', 'June', 'Max', 'Ivy', 'Ray', 'Zoe']
+LAST_NAMES = ['Quevedo', 'Petals', 'Holloway', 'Reyes', 'Park', 'Okafor',
+              'Novak', 'Fischer', 'Lindqvist', 'Moreau', 'Tanaka', 'Shah']
+BAND_NOUNS = ['Petals', 'Wolves', 'Kids', 'Brothers', 'Machines',
+              'Ghosts', 'Horses', 'Lights', 'Saints', 'Strangers']
+
+
+def _insert(table, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        insert_rows(table, rows[start:start + batch_size])
+    db.session.commit()
+
+
+def _phone(rng):
+    return f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-' \
+        f'{rng.randint(0, 9999):04d}'
+
+
+def _slug(name):
+    return ''.join(c for c in name.lower() if c.isalnum())
+
+
+def _venue(rng, n):
+    city, state = rng.choices(CITIES, weights=_CITY_WEIGHTS)[0]
+    name = f'The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {n}'
+    seeking = rng.random() < 0.3
+
+    return {'name': name,
+            'city': city,
+            'state': state,
+            'address': f'{rng.randint(1, 9999)} {rng.choice(STREETS)}',
+            'phone': _phone(rng),
+            'website': f'https://www.{_slug(name)}.com',
+            'image_link': f'https://images.example.com/venues/{n}.jpg',
+            'facebook_link': f'https://www.facebook.com/{_slug(name)}',
+            'seeking_talent': seeking,
+            'seeking_description':
+                'Looking for local acts on weeknights.' if seeking else None,
+            }
+
+
+def _artist(rng, n):
+    city, state = rng.choices(CITIES, weights=_CITY_WEIGHTS)[0]
+    if rng.random() < 0.5:
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {n}'
+    else:
+        name = f'The {rng.choice(ADJECTIVES)} {rng.choice(BAND_NOUNS)} {n}'
+    seeking = rng.random() < 0.4
+
+    return {'name': name,
+            'city': city,
+            'state': state,
+            'phone': _phone(rng),
+            'website': f'https://www.{_slug(name)}.com',
+            'image_link': f'https://images.example.com/artists/{n}.jpg',
+            'facebook_link': f'https://www.facebook.com/{_slug(name)}',
+            'seeking_venue': seeking,
+            'seeking_description':
+                'Touring next season, open to bookings.' if seeking else None,
+            }
+
+
+def _popularity(ids, rng):
+    """Cumulative Zipf-like weights over `ids` in a random order."""
+    ids = list(ids)
+    rng.shuffle(ids)
+    return ids, list(itertools.accumulate(
+        1 / (rank + 1) ** 0.8 for rank in range(len(ids))))
+
+
+def _venue_show_counts(venue_weights, shows, capacity, rng, batch_size):
+    """Shows per venue index, drawn by popularity. A venue holds at most
+    `capacity` shows, one per slot; draws for a full venue are redrawn, so
+    its overflow goes to the next most popular venues."""
+    if shows > capacity * len(venue_weights):
+        raise ValueError(f'{shows} shows do not fit in {len(venue_weights)} '
+                         f'venues of {capacity} slots')
+
+    indexes = range(len(venue_weights))
+    counts = collections.Counter()
+    remaining = shows
+
+    while remaining:
+        for index in rng.choices(indexes, cum_weights=venue_weights,
+                                 k=min(remaining, batch_size)):
+            if counts[index] < capacity:
+                counts[index] += 1
+                remaining -= 1
+
+    return counts
+
+
+def truncate():
+    """Empty every catalogue table."""
+    tables = [UpcomingShow.__table__, Show.__table__, venue_genres,
+              artist_genres, Venue.__table__, Artist.__table__]
+
+    if db.session.connection().dialect.name == 'postgresql':
+        db.session.execute('TRUNCATE {} RESTART IDENTITY CASCADE'.format(
+            ', '.join(table.name for table in tables)))
+    else:
+        for table in tables:
+            db.session.execute(table.delete())
+    bump_table_versions(db.session, *VERSIONED_TABLES.values())
+    db.session.commit()
+
+
+def seed(venues=100, artists=100, shows=10000, batch_size=10000, seed=0,
+         progress=None):
+    """Bulk insert synthetic venues, artists and shows into an empty
+    database, then build the upcoming shows feed from them.
+    """
+    rng = random.Random(seed)
+
+    _insert(Venue.__table__, [_venue(rng, n) for n in range(venues)],
+            batch_size)
+    _insert(Artist.__table__, [_artist(rng, n) for n in range(artists)],
+            batch_size)
+
+    venue_ids = [row.id for row in db.session.query(Venue.id)]
+    artist_ids = [row.id for row in db.session.query(Artist.id)]
+
+    Genre.from_names(GENRES)
+    db.session.commit()
+    genre_ids = [row.id for row in db.session.query(Genre.id)]
+
+    _insert(venue_genres, [
+        {'venue_id': venue_id, 'genre_id': genre_id}
+        for venue_id in venue_ids
+        for genre_id in rng.sample(genre_ids, rng.randint(1, 3))
+    ], batch_size)
+
+    _insert(artist_genres, [
+        {'artist_id': artist_id, 'genre_id': genre_id}
+        for artist_id in artist_ids
+        for genre_id in rng.sample(genre_ids, rng.randint(1, 3))
+    ], batch_size)
+
+    venue_ids, venue_weights = _popularity(venue_ids, rng)
+    artist_ids, artist_weights = _popularity(artist_ids, rng)
+
+    # A venue books at most one show per slot (the shows table is unique on
+    # venue_id, start_time): evenings from 18:00 to 23:45 in quarter hours
+    today = datetime.datetime.combine(datetime.date.today(),
+                                      datetime.time())
+    days = 2 * 365
+    slots_per_day = 6 * 4
+    capacity = (2 * days + 1) * slots_per_day
+
+    # Every show as venue index * capacity + slot, each venue's slots drawn
+    # without replacement, then shuffled so rows go in in no particular order
+    codes = array.array('q')
+    for index, count in sorted(_venue_show_counts(
+            venue_weights, shows, capacity, rng, batch_size).items()):
+        codes.extend(index * capacity + slot
+                     for slot in rng.sample(range(capacity), count))
+    rng.shuffle(codes)
+
+    for start in range(0, shows, batch_size):
+        batch = codes[start:start + batch_size]
+        show_artists = rng.choices(artist_ids, cum_weights=artist_weights,
+                                   k=len(batch))
+        rows = []
+
+        for code, artist_id in zip(batch, show_artists):
+            index, slot = divmod(code, capacity)
+            day, quarter = divmod(slot, slots_per_day)
+            rows.append({
+                'start_time': today + datetime.timedelta(
+                    days=day - days,
+                    hours=18 + quarter // 4,
+                    minutes=15 * (quarter % 4)),
+                'artist_id': artist_id,
+                'venue_id': venue_ids[index],
+            })
+
+        _insert(Show.__table__, rows, batch_size)
+
+        if progress:
+            progress(start + len(batch), shows)
+
+    feed.rebuild(db.session)
+    db.session.commit()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES)
+    parser.add_argument('--venues', type=int)
+    parser.add_argument('--artists', type=int)
+    parser.add_argument('--shows', type=int)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--truncate', action='store_true',
+                        help='empty the catalogue tables first')
+    args = parser.parse_args()
+
+    shows, (venues, artists) = SCALES[args.scale or '10k']
+    started = time.perf_counter()
+
+    def progress(done, total):
+        elapsed = time.perf_counter() - started
+        print(f'{done}/{total} shows ({done / elapsed:.0f}/s)', flush=True)
+
+    # Sessions are never used here, so any key will do
+    with create_app({'SECRET_KEY': 'benchmarks'}).app_context():
+        if args.truncate:
+            truncate()
+        seed(args.venues or venues, args.artists or artists,
+             args.shows or shows, args.batch_size, args.seed, progress)
+
+    print(f'Seeded in {time.perf_counter() - started:.1f}s')
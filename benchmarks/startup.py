@@ -0,0 +1,112 @@
+"""Worker startup time and first-request latency.
+
+Starts a fresh interpreter per run, as a new worker would, and measures
+importing wsgi.py (the app as gunicorn loads it), then the first and second
+request to each page. Runs each configuration in turn:
+
+    lazy       templates compiled on first render
+    warmup     TEMPLATE_WARMUP compiles them all in wsgi.py
+    cache-cold warmup writing to an empty TEMPLATE_BYTECODE_CACHE_DIR
+    cache-warm warmup reading the bytecode cache the previous run wrote
+
+    python -m benchmarks.startup --runs 5
+
+Uses DATABASE_URL like the app; seed it first so the pages have content.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PATHS = ['/', '/venues', '/artists', '/shows', '/venues/create',
+         '/artists/create', '/shows/create']
+
+
+def measure():
+    """Runs in the child interpreter; prints one JSON result."""
+    started = time.perf_counter()
+    from wsgi import app
+    startup = time.perf_counter() - started
+
+    from models import Venue, Artist
+    with app.app_context():
+        venue, artist = Venue.query.first(), Artist.query.first()
+    paths = PATHS + [f'/venues/{venue.id}' for venue in [venue] if venue] + \
+        [f'/artists/{artist.id}' for artist in [artist] if artist]
+
+    client = app.test_client()
+    first, second = {}, {}
+    for timings in (first, second):
+        for path in paths:
+            started = time.perf_counter()
+            client.get(path)
+            timings[path] = (time.perf_counter() - started) * 1000
+
+    json.dump({'startup_ms': startup * 1000,
+               'first_request_ms': first,
+               'second_request_ms': second}, sys.stdout)
+
+
+def run(env):
+    output = subprocess.check_output(
+        [sys.executable, '-m', 'benchmarks.startup', '--measure'],
+        env=dict(os.environ, SECRET_KEY='benchmarks', **env),
+        stderr=subprocess.DEVNULL)
+    return json.loads(output)
+
+
+def benchmark(runs):
+    cache_dir = tempfile.mkdtemp(prefix='fyyur-templates-')
+    configurations = [
+        ('lazy', {'TEMPLATE_WARMUP': 'false'}, False),
+        ('warmup', {'TEMPLATE_WARMUP': 'true'}, False),
+        ('cache-cold', {'TEMPLATE_WARMUP': 'true',
+                        'TEMPLATE_BYTECODE_CACHE_DIR': cache_dir}, True),
+        ('cache-warm', {'TEMPLATE_WARMUP': 'true',
+                        'TEMPLATE_BYTECODE_CACHE_DIR': cache_dir}, False),
+    ]
+
+    print(f'{"configuration":14} {"startup":>9} {"first req":>10} '
+          f'{"first max":>10} {"second req":>11}')
+
+    try:
+        for name, env, clear in configurations:
+            results = []
+            for _ in range(runs):
+                if clear:
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                results.append(run(env))
+
+            startup = statistics.median(r['startup_ms'] for r in results)
+            first = statistics.median(
+                statistics.mean(r['first_request_ms'].values())
+                for r in results)
+            first_max = statistics.median(
+                max(r['first_request_ms'].values()) for r in results)
+            second = statistics.median(
+                statistics.mean(r['second_request_ms'].values())
+                for r in results)
+
+            print(f'{name:14} {startup:7.0f}ms {first:8.1f}ms '
+                  f'{first_max:8.1f}ms {second:9.1f}ms')
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--measure', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure()
+    else:
+        benchmark(args.runs)
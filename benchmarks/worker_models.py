@@ -0,0 +1,75 @@
+"""Requests per second on the read endpoints for each worker model.
+
+Starts gunicorn with sync workers, then with gevent workers, each with the
+detail-page queries run sequentially and concurrently, and drives every
+configuration with the same pool of concurrent clients. Point DATABASE_URL
+at a seeded PostgreSQL database (python -m benchmarks.seed); SQLite cannot
+overlap queries, so the gevent runs show nothing there.
+
+    python -m benchmarks.worker_models --clients 64 --duration 20
+"""
+import argparse
+
+from app import create_app
+from benchmarks.load import GET, drive, start_server, summarize
+from models import db, Venue, Artist
+
+CONFIGURATIONS = (
+    ('sync', 'false'),
+    ('sync', 'true'),
+    ('gevent', 'false'),
+    ('gevent', 'true'),
+)
+
+
+def read_requests(sample):
+    # Sessions are never used here, so any key will do
+    with create_app({'SECRET_KEY': 'benchmarks'}).app_context():
+        venue_ids = [id for id, in db.session.query(Venue.id).limit(sample)]
+        artist_ids = [id for id, in db.session.query(Artist.id).limit(sample)]
+
+    return ([GET('venues', '/venues'),
+             GET('artists', '/artists'),
+             GET('shows', '/shows')] +
+            [GET('show_venue', f'/venues/{id}') for id in venue_ids] +
+            [GET('show_artist', f'/artists/{id}') for id in artist_ids] +
+            [GET('search', '/api/v1/venues/search?q=the'),
+             GET('search', '/api/v1/artists/search?q=the')])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--sample', type=int, default=50)
+    parser.add_argument('--port', type=int, default=5050)
+    args = parser.parse_args()
+
+    requests = read_requests(args.sample)
+
+    print(f'{"worker":8} {"concurrent":>10} {"req/s":>10} {"p95 ms":>8} '
+          f'{"errors":>8}')
+    for worker_class, concurrent in CONFIGURATIONS:
+        server = start_server(args.port, workers=args.workers, env={
+            'GUNICORN_WORKER_CLASS': worker_class,
+            'CONCURRENT_QUERIES': concurrent,
+            # Every request must reach the database
+            'CACHE_BACKEND': 'null',
+        })
+        try:
+            results = drive(f'http://127.0.0.1:{args.port}', requests,
+                            args.clients, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+
+        stats = summarize([sample for samples in results.values()
+                           for sample in samples], args.duration)
+        print(f'{worker_class:8} {concurrent:>10} '
+              f'{stats["throughput_rps"]:10.1f} {stats["p95_ms"] or 0:8.1f} '
+              f'{stats["errors"]:8d}')
+
+
+if __name__ == '__main__':
+    main()
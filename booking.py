@@ -0,0 +1,167 @@
+import collections
+import datetime
+import hashlib
+import json
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Venue, Artist, Show, IdempotencyKey
+
+#----------------------------------------------------------------------------#
+# Show bookings.
+#----------------------------------------------------------------------------#
+
+# Every way of creating shows (the single form, the batch form and the API)
+# books through here: all references are checked with one query, venue
+# double-bookings with one query on the (venue_id, start_time) index, and
+# the whole batch is written in a single transaction or not at all. That
+# index is unique, so a slot taken by a concurrent booking between the check
+# and the write still fails the batch instead of double-booking the venue.
+#
+# With an idempotency key the created show ids are stored alongside a hash
+# of the request. Retrying the same request returns those ids instead of
+# booking again; reusing the key for a different request is an error.
+
+Booking = collections.namedtuple('Booking', ['show_ids', 'replayed'])
+
+
+class BookingError(Exception):
+    """The batch was rejected; `errors` lists (entry index or None,
+    message) pairs."""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(message for _, message in errors))
+        self.errors = errors
+
+
+def request_hash(entries):
+    canonical = json.dumps([[entry['artist_id'], entry['venue_id'],
+                             entry['start_time'].isoformat()]
+                            for entry in entries])
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def replay(key, digest):
+    """The Booking stored under `key`, or None if there is none (or it has
+    expired)."""
+    stored = IdempotencyKey.query.get(key)
+
+    if stored is None:
+        return None
+
+    ttl = datetime.timedelta(
+        seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+    if stored.created_at < datetime.datetime.utcnow() - ttl:
+        db.session.delete(stored)
+        db.session.flush()
+        return None
+
+    if stored.request_hash != digest:
+        raise BookingError([(None, 'This idempotency key was already used '
+                                   'for a different request.')])
+
+    return Booking([int(id) for id in stored.show_ids.split(',')], True)
+
+
+def check(entries):
+    """Raise BookingError unless every artist and venue exists and no venue
+    is booked twice at the same time."""
+    if not entries:
+        raise BookingError([(None, 'No shows to book.')])
+    if len(entries) > current_app.config['MAX_SHOWS_PER_BOOKING']:
+        raise BookingError([(None, 'Too many shows in one booking.')])
+
+    artist_ids = {entry['artist_id'] for entry in entries}
+    venue_ids = {entry['venue_id'] for entry in entries}
+
+    known = db.session.query(
+        db.literal('artist').label('kind'), Artist.id.label('id')
+    ).filter(
+        Artist.id.in_(artist_ids)
+    ).union_all(
+        db.session.query(
+            db.literal('venue'), Venue.id
+        ).filter(
+            Venue.id.in_(venue_ids)
+        )
+    ).all()
+
+    known_artists = {row.id for row in known if row.kind == 'artist'}
+    known_venues = {row.id for row in known if row.kind == 'venue'}
+
+    # A superset of the clashing slots, narrowed to exact pairs below
+    booked = {
+        (row.venue_id, row.start_time) for row in db.session.query(
+            Show.venue_id, Show.start_time
+        ).filter(
+            Show.venue_id.in_(venue_ids),
+            Show.start_time.in_({entry['start_time'] for entry in entries})
+        )
+    }
+
+    errors = []
+    seen = set()
+
+    for index, entry in enumerate(entries):
+        slot = (entry['venue_id'], entry['start_time'])
+
+        if entry['artist_id'] not in known_artists:
+            errors.append((index, f'Artist {entry["artist_id"]} does not '
+                                  f'exist.'))
+        if entry['venue_id'] not in known_venues:
+            errors.append((index, f'Venue {entry["venue_id"]} does not '
+                                  f'exist.'))
+        elif slot in booked:
+            errors.append((index, f'Venue {entry["venue_id"]} already has a '
+                                  f'show at {entry["start_time"]}.'))
+        elif slot in seen:
+            errors.append((index, f'Venue {entry["venue_id"]} is booked '
+                                  f'twice at {entry["start_time"]}.'))
+        seen.add(slot)
+
+    if errors:
+        raise BookingError(errors)
+
+
+def book_shows(entries, key=None):
+    """Create one show per entry (artist_id, venue_id, start_time) in a
+    single transaction and return a Booking of their ids.
+    """
+    entries = [{'artist_id': entry['artist_id'],
+                'venue_id': entry['venue_id'],
+                'start_time': entry['start_time'],
+                } for entry in entries]
+    digest = request_hash(entries)
+
+    if key:
+        booking = replay(key, digest)
+        if booking is not None:
+            return booking
+
+    check(entries)
+
+    shows = [Show(**entry) for entry in entries]
+    db.session.add_all(shows)
+
+    try:
+        db.session.flush()
+        show_ids = [show.id for show in shows]
+
+        if key:
+            db.session.add(IdempotencyKey(
+                key=key,
+                request_hash=digest,
+                show_ids=','.join(map(str, show_ids))
+            ))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        # A concurrent retry with the same key committed first
+        booking = replay(key, digest) if key else None
+        if booking is None:
+            raise BookingError([(None, 'A venue was booked for one of these '
+                                       'times in the meantime.')])
+        return booking
+
+    return Booking(show_ids, False)
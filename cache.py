@@ -0,0 +1,239 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, has_app_context, make_response, request, \
+    session
+from models import Venue, Artist, Show, on_commit
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#----------------------------------------------------------------------------#
+
+# Rendered GET pages are cached under their full path plus the current
+# version of every tag the page depends on ('venue', 'artist', 'show') and,
+# under @conditional, the page's ETag.
+# Committing a change to a tagged model bumps that tag's version, so every
+# page built from the old data stops being addressable at that moment; the
+# orphaned entries age out through TTL/LRU eviction.
+#
+# The LRU backend lives inside one process, so its invalidations only reach
+# the worker that made the write. Run several workers against the Redis
+# backend, which shares both entries and versions. If Redis is unreachable
+# or slow, pages are rendered uncached rather than failing; a lost version
+# bump leaves old pages addressable until CACHE_TTL runs out.
+
+TAGS = {
+    Venue: 'venue',
+    Artist: 'artist',
+    Show: 'show',
+}
+
+
+class NullCache:
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def versions(self, tags):
+        return [0 for tag in tags]
+
+    def bump(self, tag):
+        pass
+
+
+class LRUCache:
+    """In-process cache holding up to `maxsize` entries for `ttl` seconds.
+
+    Tag versions are kept apart from the entries so eviction can never
+    reset a version and resurrect a stale page.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.tag_versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def versions(self, tags):
+        return [self.tag_versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tag):
+        with self.lock:
+            self.tag_versions[tag] = self.tag_versions.get(tag, 0) + 1
+
+
+class RedisCache:
+    """Cache shared by every worker through a Redis (or Redis-compatible)
+    client exposing get/set/mget/incr.
+
+    Client `errors` are logged and degrade to a miss: get() finds nothing,
+    set() and bump() do nothing and versions() returns None, which tells
+    the caller not to cache at all.
+    """
+
+    def __init__(self, client, ttl=300, prefix='fyyur:', errors=(OSError,)):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.errors = errors
+
+    def _failed(self, operation, error):
+        current_app.logger.warning('cache %s failed: %s', operation, error)
+
+    def get(self, key):
+        try:
+            value = self.client.get(self.prefix + key)
+        except self.errors as error:
+            self._failed('get', error)
+            return None
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value):
+        try:
+            self.client.set(self.prefix + key, pickle.dumps(value),
+                            ex=self.ttl)
+        except self.errors as error:
+            self._failed('set', error)
+
+    def versions(self, tags):
+        try:
+            values = self.client.mget(
+                [f'{self.prefix}version:{tag}' for tag in tags])
+        except self.errors as error:
+            self._failed('versions', error)
+            return None
+        return [int(value or 0) for value in values]
+
+    def bump(self, tag):
+        try:
+            self.client.incr(f'{self.prefix}version:{tag}')
+        except self.errors as error:
+            self._failed('bump', error)
+
+
+class ResponseCache:
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config['CACHE_BACKEND']
+
+        if backend == 'lru':
+            store = LRUCache(app.config['CACHE_MAXSIZE'],
+                             app.config['CACHE_TTL'])
+        elif backend == 'redis':
+            import redis
+            timeout = app.config['CACHE_REDIS_TIMEOUT']
+            store = RedisCache(
+                redis.Redis.from_url(app.config['CACHE_REDIS_URL'],
+                                     socket_connect_timeout=timeout,
+                                     socket_timeout=timeout),
+                app.config['CACHE_TTL'],
+                errors=(redis.exceptions.RedisError, OSError))
+        else:
+            store = NullCache()
+
+        app.extensions['response_cache'] = store
+
+    @property
+    def store(self):
+        return current_app.extensions['response_cache']
+
+    def cached(self, *tags):
+        """Cache a GET view's response until one of `tags` is invalidated."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Pending flash messages belong to this visitor only
+                if request.method != 'GET' or session.get('_flashes'):
+                    return view(*args, **kwargs)
+
+                store = self.store
+                versions = store.versions(tags)
+
+                # The backend is unavailable: serve uncached
+                if versions is None:
+                    return view(*args, **kwargs)
+
+                versions = ','.join(map(str, versions))
+                key = f'page:{request.full_path}:{versions}:' \
+                    f'{g.get("etag", "")}'
+
+                entry = store.get(key)
+
+                if entry is not None:
+                    g.cache_result = 'hit'
+                    body, mimetype = entry
+                    return current_app.response_class(body, mimetype=mimetype)
+
+                g.cache_result = 'miss'
+
+                # A page built from a lagging replica would be cached under
+                # the new tag versions and outlive the lag, so build it from
+                # the primary
+                if not isinstance(store, NullCache):
+                    g.read_replica = False
+
+                response = make_response(view(*args, **kwargs))
+
+                if response.status_code == 200 and \
+                        not response.is_streamed:
+                    store.set(key, (response.get_data(), response.mimetype))
+
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        store = self.store
+
+        for tag in tags:
+            store.bump(tag)
+
+
+cache = ResponseCache()
+
+#----------------------------------------------------------------------------#
+# Invalidation.
+#----------------------------------------------------------------------------#
+
+
+def _invalidate_cache_tags(changes, reloaded):
+    tags = {TAGS[model] for model, _ in changes}.union(
+        TAGS[model] for model in reloaded)
+
+    if has_app_context():
+        cache.invalidate(*tags)
+
+
+on_commit(TAGS, _invalidate_cache_tags)
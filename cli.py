@@ -0,0 +1,457 @@
+import csv
+import io
+import json
+import time
+import zlib
+
+import click
+from flask.cli import AppGroup
+from werkzeug.datastructures import MultiDict
+
+from forms import VenueForm, ArtistForm, ShowForm, parse_start_time
+from models import db, Venue, Artist, Show, Genre, UpcomingShow, \
+    VERSIONED_TABLES, bump_table_versions, mark_changed
+from cache import cache
+import feed
+from api import NDJSON_BATCH_SIZE, dumps
+
+#----------------------------------------------------------------------------#
+# Catalogue commands.
+#----------------------------------------------------------------------------#
+
+catalogue_cli = AppGroup('catalogue', help='Bulk catalogue operations.')
+
+#  Import
+#  ----------------------------------------------------------------
+
+# Rows are validated with the same forms the create pages use, then written
+# in chunks, one transaction per chunk. Rows carrying an id keep it (unless
+# --new-ids), so an export of venues, artists and then shows imports into an
+# empty catalogue with every show still pointing at its venue and artist.
+# Shows are the bulk of any partner catalogue, so their artist/venue
+# references are checked with one IN query per chunk and the rows go in
+# through COPY on PostgreSQL (a single executemany elsewhere).
+
+FORMS = {
+    'venues': VenueForm,
+    'artists': ArtistForm,
+    'shows': ShowForm,
+}
+
+
+def read_rows(source, fmt):
+    """Yield (line number, row dict) from a CSV or NDJSON stream. NDJSON
+    lines that are not a JSON object are reported and yielded as None."""
+    if fmt == 'csv':
+        reader = csv.DictReader(source)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            if not isinstance(row, dict):
+                click.echo(f'line {number}: rejected (invalid JSON)',
+                           err=True)
+                row = None
+            yield number, row
+
+
+SHOW_TIME_FORMAT = ShowForm.start_time.kwargs.get(
+    'format', '%Y-%m-%d %H:%M:%S')
+
+
+def form_data(row):
+    data = MultiDict()
+
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == 'genres' and isinstance(value, str):
+            value = [genre.strip() for genre in value.split(',')]
+        if isinstance(value, bool):
+            value = 'y' if value else 'false'
+        if key == 'start_time' and isinstance(value, str):
+            try:
+                value = parse_start_time(value).strftime(SHOW_TIME_FORMAT)
+            except ValueError:
+                pass  # left for the form to reject
+        if isinstance(value, list):
+            data.setlist(key, value)
+        else:
+            data[key] = str(value)
+
+    return data
+
+
+def validate(kind, number, row, keep_ids=True):
+    """The form's data for `row` (plus its id, if kept), or None after
+    reporting its errors."""
+    form = FORMS[kind](form_data(row), meta={'csrf': False})
+
+    if not form.validate():
+        errors = '; '.join(f'{name}: {", ".join(messages)}'
+                           for name, messages in form.errors.items())
+        click.echo(f'line {number}: rejected ({errors})', err=True)
+        return None
+
+    data = form.data
+
+    if keep_ids and row.get('id') not in (None, ''):
+        try:
+            data['id'] = int(row['id'])
+        except (TypeError, ValueError):
+            click.echo(f'line {number}: rejected (id: Must be a numeric '
+                       f'id.)', err=True)
+            return None
+
+    return data
+
+
+class Importer:
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.genres = {genre.name: genre for genre in Genre.query}
+
+    def genres_for(self, names):
+        missing = [name for name in names if name not in self.genres]
+
+        if missing:
+            self.genres.update(
+                (genre.name, genre) for genre in Genre.from_names(missing))
+
+        return [self.genres[name] for name in names]
+
+    def write(self, chunk):
+        """Write one chunk of (line number, form data); return the number of
+        rows written.
+        """
+        if self.kind == 'shows':
+            return self.write_shows(chunk)
+
+        model = Venue if self.kind == 'venues' else Artist
+        columns = set(model.__table__.columns.keys()) - {'updated_at'}
+
+        db.session.add_all(
+            model(genres=self.genres_for(data['genres']),
+                  **{key: value for key, value in data.items()
+                     if key in columns})
+            for _, data in chunk
+        )
+
+        if any('id' in data for _, data in chunk):
+            db.session.flush()
+            sync_id_sequence(model.__table__)
+
+        return len(chunk)
+
+    def write_shows(self, chunk):
+        artist_ids = {int(data['artist_id']) for _, data in chunk}
+        venue_ids = {int(data['venue_id']) for _, data in chunk}
+
+        known_artists = {row.id for row in db.session.query(
+            Artist.id).filter(Artist.id.in_(artist_ids))}
+        known_venues = {row.id for row in db.session.query(
+            Venue.id).filter(Venue.id.in_(venue_ids))}
+        # Venues host one show at a time (the shows table is unique on
+        # venue_id, start_time)
+        booked = {(row.venue_id, row.start_time) for row in db.session.query(
+            Show.venue_id, Show.start_time
+        ).filter(
+            Show.venue_id.in_(venue_ids),
+            Show.start_time.in_({data['start_time'] for _, data in chunk})
+        )}
+
+        rows = []
+
+        for number, data in chunk:
+            artist_id = int(data['artist_id'])
+            venue_id = int(data['venue_id'])
+            slot = (venue_id, data['start_time'])
+
+            if artist_id not in known_artists:
+                click.echo(f'line {number}: rejected (unknown artist '
+                           f'{artist_id})', err=True)
+            elif venue_id not in known_venues:
+                click.echo(f'line {number}: rejected (unknown venue '
+                           f'{venue_id})', err=True)
+            elif slot in booked:
+                click.echo(f'line {number}: rejected (venue {venue_id} '
+                           f'already has a show at {data["start_time"]})',
+                           err=True)
+            else:
+                booked.add(slot)
+                row = {'start_time': data['start_time'],
+                       'artist_id': artist_id,
+                       'venue_id': venue_id,
+                       }
+                if 'id' in data:
+                    row['id'] = data['id']
+                rows.append(row)
+
+        # COPY takes one column list, so rows with and without ids go in
+        # separately
+        kept = [row for row in rows if 'id' in row]
+        new = [row for row in rows if 'id' not in row]
+
+        if rows:
+            last_id = db.session.query(db.func.max(Show.id)).scalar() or 0
+            for group in (kept, new):
+                if group:
+                    insert_rows(Show.__table__, group)
+            if kept:
+                sync_id_sequence(Show.__table__)
+
+            # Core inserts bypass the flush that keeps the feed current
+            kept_ids = [row['id'] for row in kept]
+            feed.refresh(
+                db.session,
+                db.or_(UpcomingShow.id > last_id,
+                       UpcomingShow.id.in_(kept_ids)),
+                db.or_(Show.id > last_id, Show.id.in_(kept_ids)))
+            mark_changed(db.session, Show)
+
+        return len(rows)
+
+
+def sync_id_sequence(table):
+    """Move a PostgreSQL id sequence past ids inserted explicitly."""
+    if db.session.connection().dialect.name == 'postgresql':
+        db.session.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"(SELECT max(id) FROM {table.name}))")
+
+
+def insert_rows(table, rows):
+    # Core inserts bypass the flush that counts writes for the page stamps
+    if table.name in VERSIONED_TABLES.values():
+        bump_table_versions(db.session, table.name)
+
+    connection = db.session.connection()
+
+    if connection.dialect.name != 'postgresql':
+        connection.execute(table.insert(), rows)
+        return
+
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([row[c] for c in columns] for row in rows)
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(
+        f'COPY {table.name} ({", ".join(columns)}) FROM STDIN WITH CSV',
+        buffer
+    )
+
+
+@catalogue_cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(FORMS)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Input format; inferred from the file extension.')
+@click.option('--chunk-size', default=5000, show_default=True,
+              help='Rows written per transaction.')
+@click.option('--keep-ids/--new-ids', default=True, show_default=True,
+              help='Keep the ids of rows that carry one, as exports do.')
+def import_catalogue(kind, source, fmt, chunk_size, keep_ids):
+    """Import venues, artists or shows from a CSV or NDJSON file.
+
+    Use - as SOURCE to read standard input.
+    """
+    fmt = fmt or ('csv' if source.name.endswith('.csv') else 'ndjson')
+    importer = Importer(kind)
+
+    started = time.perf_counter()
+    written = rejected = 0
+    chunk = []
+
+    def flush():
+        nonlocal written, rejected
+        try:
+            count = importer.write(chunk)
+            db.session.commit()
+        except Exception as error:
+            db.session.rollback()
+            raise click.ClickException(
+                f'chunk ending at line {chunk[-1][0]} failed ({error}); '
+                f'{written} rows were imported before it') from error
+
+        written += count
+        rejected += len(chunk) - count
+        chunk.clear()
+
+        elapsed = time.perf_counter() - started
+        click.echo(f'{kind}: {written} imported, {rejected} rejected '
+                   f'({written / elapsed:.0f} rows/s)', err=True)
+
+    for number, row in read_rows(source, fmt):
+        data = None if row is None else validate(kind, number, row,
+                                                  keep_ids)
+
+        if data is None:
+            rejected += 1
+            continue
+
+        chunk.append((number, data))
+
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+
+    elapsed = time.perf_counter() - started
+    click.echo(f'Imported {written} {kind} in {elapsed:.1f}s '
+               f'({written / max(elapsed, 1e-9):.0f} rows/s); '
+               f'{rejected} rejected.')
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+# Whole tables are streamed straight from a server-side cursor (yield_per),
+# a batch at a time, so memory stays flat however large the catalogue is.
+# Rows use the import command's field names and keep their ids, so venues,
+# artists and then shows exported here import into an empty catalogue
+# as-is, shows still pointing at their venues and artists. Exports are only
+# offered here, to operators: over HTTP they would let any client pull the
+# whole catalogue.
+
+EXPORTS = {
+    'venues': Venue,
+    'artists': Artist,
+    'shows': Show,
+}
+
+
+def export_rows(kind, batch_size=NDJSON_BATCH_SIZE):
+    """Yield every venue, artist or show as a dict."""
+    model = EXPORTS[kind]
+    columns = [column for column in model.__table__.columns
+               if column.name != 'updated_at']
+
+    rows = db.session.query(*columns).order_by(model.id).yield_per(batch_size)
+    batch = []
+
+    for row in rows:
+        batch.append(row._asdict())
+
+        if len(batch) == batch_size:
+            yield from _with_genres(model, batch)
+            batch = []
+
+    yield from _with_genres(model, batch)
+
+
+def _with_genres(model, batch):
+    if model is not Show and batch:
+        genres = {}
+
+        for entity_id, genre in db.session.query(
+                model.id, Genre.name
+        ).join(
+            model.genres
+        ).filter(
+            model.id.in_([row['id'] for row in batch])
+        ).order_by(Genre.name):
+            genres.setdefault(entity_id, []).append(genre)
+
+        for row in batch:
+            row['genres'] = genres.get(row['id'], [])
+
+    return batch
+
+
+def export_chunks(kind, fmt):
+    """Encode export_rows(kind) as NDJSON or CSV, one chunk per row."""
+    rows = export_rows(kind)
+
+    if fmt == 'ndjson':
+        for row in rows:
+            yield dumps(row) + b'\n'
+        return
+
+    buffer = io.StringIO()
+    writer = None
+
+    for row in rows:
+        if 'genres' in row:
+            row['genres'] = ','.join(row['genres'])
+        for key, value in row.items():
+            if isinstance(value, bool):
+                row[key] = 'true' if value else 'false'
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row))
+            writer.writeheader()
+
+        writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)
+
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+@catalogue_cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(EXPORTS)))
+@click.argument('output', type=click.File('wb'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              default='ndjson', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True,
+              help='Gzip the output stream.')
+def export_catalogue(kind, output, fmt, compress):
+    """Stream every venue, artist or show to OUTPUT (default stdout)."""
+    chunks = export_chunks(kind, fmt)
+
+    if compress:
+        chunks = gzipped(chunks)
+
+    for chunk in chunks:
+        output.write(chunk)
+
+
+#----------------------------------------------------------------------------#
+# Feed commands.
+#----------------------------------------------------------------------------#
+
+feed_cli = AppGroup('feed', help='Maintain the upcoming shows feed.')
+
+
+@feed_cli.command('rollover')
+def rollover_feed():
+    """Remove shows that have started from the feed. Run every minute or
+    so; pages built from the feed hide started shows in the meantime.
+    """
+    removed = feed.rollover(db.session)
+    db.session.commit()
+
+    if removed:
+        cache.invalidate('show')
+
+    click.echo(f'Removed {removed} started shows from the feed.')
+
+
+@feed_cli.command('rebuild')
+def rebuild_feed():
+    """Recompute the whole feed from the shows table."""
+    feed.rebuild(db.session)
+    db.session.commit()
+    cache.invalidate('show')
+
+    count = db.session.query(db.func.count(UpcomingShow.id)).scalar()
+    click.echo(f'Feed rebuilt with {count} upcoming shows.')
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, has_app_context
+
+#----------------------------------------------------------------------------#
+# Concurrent queries.
+#----------------------------------------------------------------------------#
+
+# Independent queries of one request can overlap their round trips. The
+# first call runs inline on the request's own session; every other call runs
+# in its own app context, so it gets its own scoped session and connection,
+# and must return plain data rather than ORM instances.
+#
+# A request therefore holds 1 + N pooled connections at once, N being the
+# calls handed to the executor (every call after the first): one extra for a
+# detail page. Size DB_POOL_SIZE + DB_MAX_OVERFLOW for that many per
+# in-flight request (worker_connections of them under gevent), or leave
+# CONCURRENT_QUERIES off.
+#
+# Under gunicorn's gevent worker the executor's threads are greenlets and
+# psycopg2 is made cooperative (see gunicorn.conf.py), so a worker serves
+# many requests at once and these calls overlap within each of them.
+
+_executor = None
+
+
+def executor():
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=current_app.config['CONCURRENT_QUERY_WORKERS'],
+            thread_name_prefix='query')
+    return _executor
+
+
+def gather(*calls):
+    """Run zero-argument callables concurrently and return their results in
+    order. With CONCURRENT_QUERIES off they simply run one after another.
+    """
+    if not current_app.config['CONCURRENT_QUERIES'] or len(calls) < 2:
+        return [call() for call in calls]
+
+    app = current_app._get_current_object()
+    # Carry the request's profile and replica choice into each call
+    state = dict(vars(g))
+
+    def run(call):
+        with app.app_context():
+            vars(g).update(state)
+            return call()
+
+    first, *rest = calls
+    futures = [executor().submit(run, call) for call in rest]
+    return [first()] + [future.result() for future in futures]
@@ -0,0 +1,66 @@
+import datetime
+import hashlib
+from functools import wraps
+
+from flask import abort, current_app, g, make_response, request, session
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+
+def conditional(stamp):
+    """Give a GET view a strong ETag and Last-Modified derived from
+    `stamp(**view_args)`, and answer matching If-None-Match /
+    If-Modified-Since requests with 304 without calling the view.
+
+    `stamp` returns (token, last_modified), or None when the entity the
+    view renders doesn't exist.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages make the body differ per visitor
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            version = stamp(**kwargs)
+
+            if version is None:
+                abort(404)
+
+            token, last_modified = version
+            etag = hashlib.sha1(
+                f'{request.full_path}:{token}'.encode()).hexdigest()
+
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0)
+
+            # The response cache keys on this too, so a stamp that moves
+            # without a write (a show starting) can't serve an older body
+            g.etag = etag
+
+            if not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
+def not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+
+    since = request.if_modified_since
+
+    if since is None or last_modified is None:
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+    return last_modified <= since
@@ -1,12 +1,118 @@
 import os
-SECRET_KEY = os.urandom(32)
+
+# Every worker and node must sign sessions with the same key. wsgi.py refuses
+# to serve without one unless debug mode is on; elsewhere (CLI commands, the
+# debug server) create_app() falls back to a random per-process key.
+SECRET_KEY = os.environ.get('SECRET_KEY')
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Enable debug mode.
-DEBUG = True
+DEBUG = os.environ.get('FLASK_DEBUG', '').lower() in ('1', 'true')
 
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 # Connect to the database
 
-SQLALCHEMY_DATABASE_URI = 'postgres://andrew@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    'DATABASE_URL', 'postgres://andrew@localhost:5432/fyyur')
+
+# Connection pool. With DB_PGBOUNCER set, connections are opened per checkout
+# and handed straight back, leaving pooling to PgBouncer.
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', '').lower() in ('1', 'true')
+
+if SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+elif DB_PGBOUNCER:
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True,
+    }
+else:
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get(
+            'DB_POOL_PRE_PING', 'true').lower() in ('1', 'true'),
+    }
+
+# Internal endpoints (/internal/... and /metrics) only answer requests
+# carrying "Authorization: Bearer <INTERNAL_TOKEN>", and are off while it is
+# unset. Client addresses prove nothing behind a proxy, where every request
+# arrives from the proxy's address.
+INTERNAL_TOKEN = os.environ.get('INTERNAL_TOKEN')
+
+# Listing pagination
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Maximum number of venue/artist search results
+SEARCH_RESULT_LIMIT = 20
+
+# Response cache: 'lru' (per process), 'redis' (shared by all workers) or
+# 'null' to disable. An LRU cache only sees its own worker's writes, so it is
+# the default only for single-process SQLite runs.
+CACHE_BACKEND = os.environ.get(
+    'CACHE_BACKEND',
+    'lru' if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else 'redis')
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 300))
+CACHE_MAXSIZE = int(os.environ.get('CACHE_MAXSIZE', 1024))
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+# Seconds to wait on Redis before serving the page uncached
+CACHE_REDIS_TIMEOUT = float(os.environ.get('CACHE_REDIS_TIMEOUT', 0.1))
+
+# Per-request SQL profiling; requests slower than SLOW_REQUEST_MS are kept for
+# /internal/slow-requests. Off by default outside debug mode, as the
+# Server-Timing header it adds tells every client how long the SQL took.
+PROFILE_REQUESTS = os.environ.get(
+    'PROFILE_REQUESTS', str(DEBUG)).lower() in ('1', 'true')
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_BUFFER = 100
+
+# Run a detail page's independent queries concurrently. A request then holds
+# 1 + N pooled connections, N being the queries handed to other threads (1
+# for a detail page): size DB_POOL_SIZE + DB_MAX_OVERFLOW for that many per
+# in-flight request before turning this on (see concurrency.py).
+CONCURRENT_QUERIES = os.environ.get(
+    'CONCURRENT_QUERIES', 'false').lower() in ('1', 'true')
+CONCURRENT_QUERY_WORKERS = int(os.environ.get('CONCURRENT_QUERY_WORKERS', 8))
+
+# Read replicas for @read_only views, as a comma-separated list of URLs.
+# Replicas failing a health check, or lagging more than REPLICA_MAX_LAG
+# seconds, are skipped until the next check.
+SQLALCHEMY_REPLICA_URIS = [
+    uri for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')
+    if uri]
+REPLICA_HEALTH_INTERVAL = int(os.environ.get('REPLICA_HEALTH_INTERVAL', 5))
+REPLICA_MAX_LAG = int(os.environ.get('REPLICA_MAX_LAG', 10))
+# After a write, that visitor's reads stay on the primary this long
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+
+# Upcoming shows listed on the home page
+HOME_UPCOMING_SHOWS = 6
+
+# Most shows one booking (the batch form or POST /api/v1/shows) may create,
+# and how long an idempotency key replays its booking
+MAX_SHOWS_PER_BOOKING = int(os.environ.get('MAX_SHOWS_PER_BOOKING', 500))
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+# Name autocomplete (/api/v1/autocomplete/<kind>). Each worker holds the
+# venue and artist names in memory, checks the tables' write counters for
+# other workers' writes every AUTOCOMPLETE_SYNC_INTERVAL seconds (rebuilding
+# in the background when they have moved), and under gunicorn loads them in
+# the master before forking when AUTOCOMPLETE_WARM is set.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+AUTOCOMPLETE_SYNC_INTERVAL = int(
+    os.environ.get('AUTOCOMPLETE_SYNC_INTERVAL', 5))
+AUTOCOMPLETE_WARM = os.environ.get(
+    'AUTOCOMPLETE_WARM', 'true').lower() in ('1', 'true')
+
+# Templates. Outside debug mode they are not checked for changes on every
+# render, and TEMPLATE_WARMUP compiles them all when wsgi.py starts serving.
+# Set TEMPLATE_BYTECODE_CACHE_DIR to keep the compiled code on disk between
+# restarts; `flask templates compile` fills it.
+TEMPLATES_AUTO_RELOAD = DEBUG
+TEMPLATE_WARMUP = os.environ.get(
+    'TEMPLATE_WARMUP', str(not DEBUG)).lower() in ('1', 'true')
+TEMPLATE_BYTECODE_CACHE_DIR = os.environ.get('TEMPLATE_BYTECODE_CACHE_DIR')
@@ -0,0 +1,91 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import NullPool, QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+
+class PoolStats:
+    """Checkout counts and the time spent waiting for a connection."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited, timed_out=False):
+        with self.lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def as_dict(self):
+        with self.lock:
+            return {'checkouts': self.checkouts,
+                    'timeouts': self.timeouts,
+                    'wait_total_ms': self.wait_total * 1000,
+                    'wait_avg_ms': self.wait_total * 1000 / max(
+                        self.checkouts, 1),
+                    'wait_max_ms': self.wait_max * 1000,
+                    }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool timing how long each checkout waits for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.stats.record(time.perf_counter() - started, timed_out)
+
+
+def init_app(app):
+    """Pick the pool class for the app's engine before it is created."""
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+
+    if uri.startswith('sqlite'):
+        return
+    if app.config.get('DB_PGBOUNCER'):
+        options.setdefault('poolclass', NullPool)
+    else:
+        options.setdefault('poolclass', InstrumentedQueuePool)
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {'class': type(pool).__name__, 'status': pool.status()}
+
+    if isinstance(pool, QueuePool):
+        status.update({'size': pool.size(),
+                       'checked_in': pool.checkedin(),
+                       'checked_out': pool.checkedout(),
+                       'overflow': pool.overflow(),
+                       })
+    if isinstance(pool, InstrumentedQueuePool):
+        status.update(pool.stats.as_dict())
+
+    return status
@@ -6,9 +6,7 @@ from fabric.contrib.console import confirm
 
 def test():
     with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
-        )
+        result = local("python -m pytest", capture=True)
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
@@ -39,9 +37,7 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    local("heroku run python -m pytest")
 
 
 def deploy():
@@ -56,3 +52,17 @@ def deploy():
 
 def rollback():
     local("heroku rollback")
+
+# benchmarks
+
+
+def seed(scale='100k'):
+    local("python -m benchmarks.seed --truncate --scale {}".format(scale))
+
+
+def bench(output='bench.json', compare=None, clients=32, duration=30):
+    command = "python -m benchmarks.load --serve --clients {} --duration {} " \
+        "--output {}".format(clients, duration, output)
+    if compare:
+        command += " --compare {}".format(compare)
+    local(command)
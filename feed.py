@@ -0,0 +1,100 @@
+import datetime
+
+from sqlalchemy import event
+
+from models import db, Venue, Artist, Show, UpcomingShow
+
+#----------------------------------------------------------------------------#
+# Upcoming shows feed.
+#----------------------------------------------------------------------------#
+
+# upcoming_shows holds one row per show that has not started, denormalized
+# with its artist and venue names and images. Every flush touching shows,
+# venues or artists rewrites the affected feed rows in the same transaction,
+# so the feed commits (or rolls back) with the change. Shows leave the feed
+# once started through `rollover`, run on a schedule:
+#
+#     flask feed rollover      # e.g. every minute from cron
+#     flask feed rebuild       # recompute everything from shows
+
+FEED_COLUMNS = [
+    UpcomingShow.id,
+    UpcomingShow.start_time,
+    UpcomingShow.artist_id,
+    UpcomingShow.venue_id,
+    UpcomingShow.artist_name,
+    UpcomingShow.artist_image_link,
+    UpcomingShow.venue_name,
+    UpcomingShow.venue_image_link,
+]
+
+FEED = UpcomingShow.__table__
+
+
+def refresh(session, feed_criterion, show_criterion):
+    """Replace the feed rows matching `feed_criterion` with the upcoming
+    shows matching `show_criterion`."""
+    session.execute(FEED.delete().where(feed_criterion))
+    session.execute(FEED.insert().from_select(
+        FEED_COLUMNS,
+        Show.listing_query().filter(
+            Show.start_time > datetime.datetime.now(),
+            show_criterion
+        ).statement
+    ))
+
+
+def rollover(session):
+    """Drop shows that have started; returns how many were removed."""
+    return session.execute(FEED.delete().where(
+        UpcomingShow.start_time <= datetime.datetime.now()
+    )).rowcount
+
+
+def rebuild(session):
+    refresh(session, db.true(), db.true())
+
+
+def changed_ids(session):
+    """Ids of the shows, venues and artists this flush wrote, keyed by the
+    feed column that refers to them."""
+    ids = {UpcomingShow.id: set(),
+           UpcomingShow.venue_id: set(),
+           UpcomingShow.artist_id: set(),
+           }
+
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Show):
+            ids[UpcomingShow.id].add(obj.id)
+        elif isinstance(obj, Venue):
+            ids[UpcomingShow.venue_id].add(obj.id)
+        elif isinstance(obj, Artist):
+            ids[UpcomingShow.artist_id].add(obj.id)
+
+    return ids
+
+
+SHOW_KEYS = {
+    UpcomingShow.id: Show.id,
+    UpcomingShow.venue_id: Show.venue_id,
+    UpcomingShow.artist_id: Show.artist_id,
+}
+
+
+@event.listens_for(db.session, 'after_flush')
+def refresh_changed(session, flush_context):
+    ids = {column: ids for column, ids in changed_ids(session).items() if ids}
+
+    if ids:
+        refresh(session,
+                db.or_(*[column.in_(ids[column]) for column in ids]),
+                db.or_(*[SHOW_KEYS[column].in_(ids[column])
+                         for column in ids]))
+
+
+@event.listens_for(db.session, 'after_bulk_update')
+@event.listens_for(db.session, 'after_bulk_delete')
+def rebuild_after_bulk(update_context):
+    # Bulk statements don't say which rows they touched
+    if update_context.mapper.class_ in (Show, Venue, Artist):
+        rebuild(update_context.session)
@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+import shutil
+
+#----------------------------------------------------------------------------#
+# Gunicorn.
+#----------------------------------------------------------------------------#
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Sync workers suit CPU-bound rendering: size WEB_CONCURRENCY to the cores.
+# GUNICORN_WORKER_CLASS=gevent serves many slow clients per worker; keep the
+# pool (DB_POOL_SIZE + DB_MAX_OVERFLOW) in step with worker_connections.
+#
+# Reload: kill -HUP the master to replace workers one by one with the
+# config re-read. preload_app loads the code once in the master, so a code
+# deploy needs USR2 (start a new master) followed by QUIT to the old one.
+
+bind = '0.0.0.0:%s' % os.environ.get('PORT', '5000')
+workers = int(os.environ.get('WEB_CONCURRENCY',
+                             multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth; the jitter stops
+# them all restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # Samples left by a previous run would be merged into this one's
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def when_ready(server):
+    # Load the autocomplete indexes once in the master, so every worker
+    # (including ones recycled by max_requests) starts with them in memory
+    from wsgi import app
+    import autocomplete
+
+    if app.config['AUTOCOMPLETE_WARM']:
+        try:
+            autocomplete.warm(app)
+        except Exception:
+            server.log.exception('could not warm the autocomplete indexes')
+
+
+def post_worker_init(worker):
+    # The gevent worker has monkey-patched the stdlib by now; psycopg2 does
+    # its socket I/O in C and needs its own hook to yield while it waits
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+
+        patch_psycopg()
+
+
+def post_fork(server, worker):
+    # Connections opened in the master while preloading must not be shared
+    # with the forked workers
+    from wsgi import app
+    from models import db
+
+    with app.app_context():
+        db.engine.dispose()
+
+
+def child_exit(server, worker):
+    import metrics
+
+    metrics.mark_process_dead(worker.pid)
@@ -0,0 +1,49 @@
+import hmac
+
+from flask import Blueprint, abort, current_app, request
+
+from api import json_response
+from dbpool import pool_status
+from models import db
+from profiling import profiler
+
+#----------------------------------------------------------------------------#
+# Internal endpoints.
+#----------------------------------------------------------------------------#
+
+internal = Blueprint('internal', __name__, url_prefix='/internal')
+
+
+def require_internal_token():
+    """404 unless the request carries the configured INTERNAL_TOKEN as a
+    bearer token, so the endpoint looks absent to everyone else."""
+    token = current_app.config.get('INTERNAL_TOKEN')
+    scheme, _, credentials = request.headers.get(
+        'Authorization', '').partition(' ')
+
+    if not token or scheme.lower() != 'bearer' or \
+            not hmac.compare_digest(credentials.encode(), token.encode()):
+        abort(404)
+
+
+internal.before_request(require_internal_token)
+
+
+@internal.route('/pool')
+def pool():
+    status = pool_status(db.engine)
+    router = current_app.extensions['replica_router']
+
+    if router.keys:
+        status['replicas'] = {
+            key: dict(pool_status(db.get_engine(bind=key)),
+                      healthy=router.healthy[key])
+            for key in router.keys
+        }
+
+    return json_response(status)
+
+
+@internal.route('/slow-requests')
+def slow_requests():
+    return json_response({'data': profiler.slow()})
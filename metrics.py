@@ -0,0 +1,113 @@
+import os
+import time
+
+from flask import current_app, g, request
+from flask import before_render_template, template_rendered
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, \
+    CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+from internal import require_internal_token
+
+#----------------------------------------------------------------------------#
+# Prometheus metrics.
+#----------------------------------------------------------------------------#
+
+# Under a pre-fork server each worker writes its samples to files in
+# PROMETHEUS_MULTIPROC_DIR and /metrics merges them at scrape time. The
+# directory must be set, and emptied, before the workers start.
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+REQUESTS = Counter(
+    'fyyur_requests_total', 'HTTP requests served.',
+    ['method', 'endpoint', 'status'])
+LATENCY = Histogram(
+    'fyyur_request_duration_seconds', 'Time spent serving a request.',
+    ['method', 'endpoint'], buckets=LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    'fyyur_response_size_bytes', 'Size of response bodies.',
+    ['endpoint'], buckets=SIZE_BUCKETS)
+TEMPLATE_TIME = Histogram(
+    'fyyur_template_render_seconds', 'Time spent rendering templates.',
+    ['template'], buckets=LATENCY_BUCKETS)
+DB_TIME = Histogram(
+    'fyyur_request_db_seconds', 'Time spent in SQL per request.',
+    ['endpoint'], buckets=LATENCY_BUCKETS)
+CACHE_LOOKUPS = Counter(
+    'fyyur_response_cache_total', 'Response cache lookups.',
+    ['endpoint', 'result'])
+
+
+def multiprocess_mode():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR') or
+                os.environ.get('prometheus_multiproc_dir'))
+
+
+def start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def record_request(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+
+    # Label by route rather than path to keep the series count bounded
+    endpoint = request.endpoint or 'unmatched'
+
+    REQUESTS.labels(request.method, endpoint, response.status_code).inc()
+    LATENCY.labels(request.method, endpoint).observe(
+        time.perf_counter() - started)
+
+    if response.content_length is not None:
+        RESPONSE_SIZE.labels(endpoint).observe(response.content_length)
+
+    profile = g.get('profile')
+    if profile is not None:
+        DB_TIME.labels(endpoint).observe(profile.db_time)
+
+    cache_result = g.get('cache_result')
+    if cache_result is not None:
+        CACHE_LOOKUPS.labels(endpoint, cache_result).inc()
+
+    return response
+
+
+def start_template_timer(sender, template, context, **extra):
+    g.setdefault('template_timers', []).append(time.perf_counter())
+
+
+def record_template(sender, template, context, **extra):
+    timers = g.get('template_timers')
+    if timers:
+        TEMPLATE_TIME.labels(template.name or 'string').observe(
+            time.perf_counter() - timers.pop())
+
+
+def metrics():
+    require_internal_token()
+
+    if multiprocess_mode():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return current_app.response_class(generate_latest(registry),
+                                      mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    app.before_request(start_timer)
+    app.after_request(record_request)
+    before_render_template.connect(start_template_timer, app)
+    template_rendered.connect(record_template, app)
+    app.add_url_rule('/metrics', 'metrics', metrics)
+
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live gauges; call from the server's child_exit
+    hook."""
+    if multiprocess_mode():
+        multiprocess.mark_process_dead(pid)
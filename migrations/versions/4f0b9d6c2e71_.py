@@ -0,0 +1,36 @@
+"""trigram search indexes
+
+Revision ID: 4f0b9d6c2e71
+Revises: 8c3e5f27a1d4
+Create Date: 2026-10-18 11:20:05.918733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f0b9d6c2e71'
+down_revision = '8c3e5f27a1d4'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ('name', 'city', 'state', 'genres')
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    for table in ('venues', 'artists'):
+        for column in SEARCH_COLUMNS:
+            op.create_index(
+                f'ix_{table}_{column}_trgm', table, [column], unique=False,
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'}
+            )
+
+
+def downgrade():
+    for table in ('venues', 'artists'):
+        for column in SEARCH_COLUMNS:
+            op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
@@ -0,0 +1,104 @@
+"""normalize genres into association tables
+
+Revision ID: b7d2a4e91c3f
+Revises: 4f0b9d6c2e71
+Create Date: 2026-10-18 12:41:52.660219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2a4e91c3f'
+down_revision = '4f0b9d6c2e71'
+branch_labels = None
+depends_on = None
+
+genres = sa.table('genres', sa.column('id', sa.Integer), sa.column('name', sa.String))
+
+# (entity table, association table, association foreign key)
+TAGGED = (
+    ('venues', 'venue_genres', 'venue_id'),
+    ('artists', 'artist_genres', 'artist_id'),
+)
+
+
+def upgrade():
+    op.create_table('genres',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, association, key in TAGGED:
+        op.create_table(association,
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.Column(key, sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ),
+        sa.ForeignKeyConstraint([key], [f'{table}.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('genre_id', key)
+        )
+        op.create_index(f'ix_{association}_{key}', association, [key], unique=False)
+
+    # Backfill from the comma-joined genres columns
+    bind = op.get_bind()
+    tagged = {}
+
+    for table, association, key in TAGGED:
+        entities = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        for entity_id, names in bind.execute(sa.select([entities.c.id, entities.c.genres])):
+            names = [n.strip() for n in (names or '').split(',') if n.strip()]
+            tagged[(association, key, entity_id)] = list(dict.fromkeys(names))
+
+    all_names = sorted({n for names in tagged.values() for n in names})
+    if all_names:
+        op.bulk_insert(genres, [{'name': n} for n in all_names])
+    genre_ids = dict((name, genre_id) for genre_id, name in bind.execute(
+        sa.select([genres.c.id, genres.c.name])))
+
+    for table, association, key in TAGGED:
+        links = [{'genre_id': genre_ids[n], key: entity_id}
+                 for (assoc, _, entity_id), names in tagged.items() if assoc == association
+                 for n in names]
+        if links:
+            op.bulk_insert(
+                sa.table(association, sa.column('genre_id', sa.Integer), sa.column(key, sa.Integer)),
+                links)
+
+    op.drop_index('ix_venues_genres_trgm', table_name='venues')
+    op.drop_index('ix_artists_genres_trgm', table_name='artists')
+    op.drop_column('venues', 'genres')
+    op.drop_column('artists', 'genres')
+
+
+def downgrade():
+    op.add_column('artists', sa.Column('genres', sa.VARCHAR(length=120), autoincrement=False, nullable=True))
+    op.add_column('venues', sa.Column('genres', sa.VARCHAR(length=120), autoincrement=False, nullable=True))
+
+    bind = op.get_bind()
+
+    for table, association, key in TAGGED:
+        links = sa.table(association, sa.column('genre_id', sa.Integer), sa.column(key, sa.Integer))
+        joined = {}
+        for entity_id, name in bind.execute(
+                sa.select([links.c[key], genres.c.name])
+                .select_from(links.join(genres, links.c.genre_id == genres.c.id))
+                .order_by(links.c[key], genres.c.name)):
+            joined.setdefault(entity_id, []).append(name)
+
+        entities = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        for entity_id, names in joined.items():
+            bind.execute(entities.update().where(entities.c.id == entity_id)
+                         .values(genres=','.join(names)))
+
+    for column in ('genres',):
+        op.create_index(f'ix_venues_{column}_trgm', 'venues', [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+        op.create_index(f'ix_artists_{column}_trgm', 'artists', [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+    for table, association, key in reversed(TAGGED):
+        op.drop_index(f'ix_{association}_{key}', table_name=association)
+        op.drop_table(association)
+    op.drop_table('genres')
@@ -0,0 +1,44 @@
+"""make venue and artist names and locations NOT NULL
+
+Revision ID: c4e7a2d95b13
+Revises: 9b1f4e7c3a58
+Create Date: 2026-10-18 20:14:37.520193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7a2d95b13'
+down_revision = '9b1f4e7c3a58'
+branch_labels = None
+depends_on = None
+
+COLUMNS = {
+    'name': sa.String(),
+    'city': sa.String(length=120),
+    'state': sa.String(length=120),
+}
+
+
+def upgrade():
+    # Listings are keyset paginated on these columns, and a NULL in a key
+    # drops every later row from the next page
+    for table in ('venues', 'artists'):
+        for column in COLUMNS:
+            op.execute(f"UPDATE {table} SET {column} = '' "
+                       f"WHERE {column} IS NULL")
+
+        with op.batch_alter_table(table) as batch_op:
+            for column, type_ in COLUMNS.items():
+                batch_op.alter_column(column, existing_type=type_,
+                                      nullable=False)
+
+
+def downgrade():
+    for table in ('venues', 'artists'):
+        with op.batch_alter_table(table) as batch_op:
+            for column, type_ in COLUMNS.items():
+                batch_op.alter_column(column, existing_type=type_,
+                                      nullable=True)
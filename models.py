@@ -1,64 +1,149 @@
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
+from routing import RoutingSQLAlchemy
+from sqlalchemy import event
+from concurrency import gather
 
 import datetime
+import itertools
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
+
+venue_genres = db.Table(
+    'venue_genres',
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'),
+              primary_key=True),
+    db.Column('venue_id', db.Integer,
+              db.ForeignKey('venues.id', ondelete='CASCADE'),
+              primary_key=True),
+    db.Index('ix_venue_genres_venue_id', 'venue_id')
+)
+
+artist_genres = db.Table(
+    'artist_genres',
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'),
+              primary_key=True),
+    db.Column('artist_id', db.Integer,
+              db.ForeignKey('artists.id', ondelete='CASCADE'),
+              primary_key=True),
+    db.Index('ix_artist_genres_artist_id', 'artist_id')
+)
+
+
+class Genre(db.Model):
+    __tablename__ = 'genres'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f'<Genre#{self.id}: {self.name}>'
+
+    @classmethod
+    def from_names(cls, names):
+        """Genre rows for `names`, creating any that don't exist yet.
+
+        Missing names are inserted right away with the conflict ignored, so
+        repeated calls in one session, or a concurrent request creating the
+        same genre, get the one row instead of a unique violation.
+        """
+        names = list(dict.fromkeys(names))
+
+        existing = {genre.name: genre
+                    for genre in cls.query.filter(cls.name.in_(names))}
+        missing = [name for name in names if name not in existing]
+
+        if missing:
+            if db.session.get_bind().dialect.name == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+                statement = insert(cls.__table__).on_conflict_do_nothing()
+            else:
+                statement = cls.__table__.insert().prefix_with('OR IGNORE')
+
+            db.session.execute(statement, [{'name': name}
+                                           for name in missing])
+            existing.update((genre.name, genre) for genre in
+                            cls.query.filter(cls.name.in_(missing)))
+
+        return [existing[name] for name in names]
 
 
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_state_city_name_id', 'state', 'city', 'name', 'id'),
+        *[db.Index(f'ix_venues_{column}_trgm', column,
+                   postgresql_using='gin',
+                   postgresql_ops={column: 'gin_trgm_ops'})
+          for column in ('name', 'city', 'state')],
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     website = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=venue_genres,
+                             order_by='Genre.name')
     seeking_talent = db.Column(db.Boolean, default=True)
     seeking_description = db.Column(db.String(120))
+    updated_at = db.Column(db.DateTime(), nullable=False,
+                           default=datetime.datetime.utcnow)
 
     def __repr__(self):
         return f'<Venue#{self.id}: {self.name}>'
 
-    @property
-    def serialize(self):
-        return {'id': self.id,
-                'name': self.name,
-                'city': self.city,
-                'state': self.state,
-                'address': self.address,
-                'phone': self.phone,
-                'website': self.website,
-                'image_link': self.image_link,
-                'facebook_link': self.facebook_link,
-                'genres': self.genres.split(','),
-                'seeking_talent': self.seeking_talent,
-                'seeking_description': self.seeking_description,
-                }
+    @classmethod
+    def directory_query(cls):
+        """Venue rows for the grouped directory, with each venue's upcoming
+        show count coming from an outer join on the same statement. Only the
+        columns the listing renders are selected.
 
-    @property
-    def serialize_with_shows(self):
-        upcoming_shows_list = Show.query.filter(
-            Show.venue_id == self.id,
-            Show.start_time > datetime.datetime.now()
-        )
+        Order by (state, city, name, id) and pass the rows to `group_by_area`.
+        """
+        now = datetime.datetime.now()
 
-        upcoming_shows = [s.serialize for s in upcoming_shows_list]
-        past_shows_list = Show.query.filter(
-            Show.venue_id == self.id,
-            Show.start_time <= datetime.datetime.now()
+        return db.session.query(
+            cls.id,
+            cls.name,
+            cls.city,
+            cls.state,
+            db.func.count(Show.id).label('num_upcoming_shows')
+        ).outerjoin(Show, db.and_(
+            Show.venue_id == cls.id,
+            Show.start_time > now
+        )).group_by(
+            cls.id
         )
 
-        past_shows = [s.serialize for s in past_shows_list]
+    @staticmethod
+    def group_by_area(rows):
+        areas = []
 
+        for (city, state), venues in itertools.groupby(
+                rows, key=lambda row: (row.city, row.state)):
+            venues = [{'id': v.id,
+                       'name': v.name,
+                       'num_upcoming_shows': v.num_upcoming_shows,
+                       } for v in venues]
+
+            areas.append({'city': city,
+                          'state': state,
+                          'venues': venues,
+                          'num_upcoming_shows': sum(
+                              v['num_upcoming_shows'] for v in venues),
+                          })
+
+        return areas
+
+    @property
+    def serialize(self):
         return {'id': self.id,
                 'name': self.name,
                 'city': self.city,
@@ -68,30 +153,36 @@ class Venue(db.Model):
                 'website': self.website,
                 'image_link': self.image_link,
                 'facebook_link': self.facebook_link,
-                'genres': self.genres.split(','),
+                'genres': [genre.name for genre in self.genres],
                 'seeking_talent': self.seeking_talent,
                 'seeking_description': self.seeking_description,
-                'upcoming_shows_count': len(upcoming_shows),
-                'upcoming_shows': upcoming_shows,
-                'past_shows_count': len(past_shows),
-                'past_shows': past_shows,
                 }
 
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_name_id', 'name', 'id'),
+        *[db.Index(f'ix_artists_{column}_trgm', column,
+                   postgresql_using='gin',
+                   postgresql_ops={column: 'gin_trgm_ops'})
+          for column in ('name', 'city', 'state')],
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
     website = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres,
+                             order_by='Genre.name')
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=True)
     seeking_description = db.Column(db.String(120))
+    updated_at = db.Column(db.DateTime(), nullable=False,
+                           default=datetime.datetime.utcnow)
 
     def __repr__(self):
         return f'<Artist#{self.id}: {self.name}>'
@@ -106,49 +197,25 @@ class Artist(db.Model):
                 'website': self.website,
                 'image_link': self.image_link,
                 'facebook_link': self.facebook_link,
-                'genres': self.genres.split(','),
-                'seeking_venue': self.seeking_venue,
-                'seeking_description': self.seeking_description,
-                }
-
-    @property
-    def serialize_with_shows(self):
-        upcoming_shows_list = Show.query.filter(
-            Show.venue_id == self.id,
-            Show.start_time > datetime.datetime.now()
-        )
-
-        upcoming_shows = [s.serialize for s in upcoming_shows_list]
-        past_shows_list = Show.query.filter(
-            Show.venue_id == self.id,
-            Show.start_time <= datetime.datetime.now()
-        )
-
-        past_shows = [s.serialize for s in past_shows_list]
-
-        return {'id': self.id,
-                'name': self.name,
-                'city': self.city,
-                'state': self.state,
-                'phone': self.phone,
-                'website': self.website,
-                'image_link': self.image_link,
-                'facebook_link': self.facebook_link,
-                'genres': self.genres.split(','),
+                'genres': [genre.name for genre in self.genres],
                 'seeking_venue': self.seeking_venue,
                 'seeking_description': self.seeking_description,
-                'upcoming_shows_count': len(upcoming_shows),
-                'upcoming_shows': upcoming_shows,
-                'past_shows_count': len(past_shows),
-                'past_shows': past_shows,
                 }
 
 
 class Show(db.Model):
     __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time',
+                 unique=True),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime(), nullable=False)
+    updated_at = db.Column(db.DateTime(), nullable=False,
+                           default=datetime.datetime.utcnow)
 
     # foreign keys
     artist_id = db.Column(db.Integer, db.ForeignKey(
@@ -165,13 +232,436 @@ class Show(db.Model):
     def __repr__(self):
         return f'<Show#{self.id}: {self.artist} {self.venue}>'
 
-    @property
-    def serialize(self):
-        return {
-            'id': self.id,
-            'start_time': self.start_time.strftime("%m/%d/%Y, %H:%M:%S"),
-            'artist_id': self.artist_id,
-            'venue_id': self.venue_id,
-            'artist': self.artist.serialize,
-            'venue': self.venue.serialize
-        }
+    @classmethod
+    def listing_query(cls):
+        """Shows joined to their artist and venue, projected to the columns
+        the listing pages render. Rows go through `serialize_listing`.
+        """
+        return db.session.query(
+            cls.id,
+            cls.start_time,
+            cls.artist_id,
+            cls.venue_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link'),
+            Venue.name.label('venue_name'),
+            Venue.image_link.label('venue_image_link')
+        ).join(
+            Artist, cls.artist_id == Artist.id
+        ).join(
+            Venue, cls.venue_id == Venue.id
+        )
+
+    @staticmethod
+    def serialize_listing(row):
+        return {'id': row.id,
+                'start_time': row.start_time,
+                'artist_id': row.artist_id,
+                'artist_name': row.artist_name,
+                'artist_image_link': row.artist_image_link,
+                'venue_id': row.venue_id,
+                'venue_name': row.venue_name,
+                'venue_image_link': row.venue_image_link,
+                }
+
+
+class UpcomingShow(db.Model):
+    """Precomputed feed of shows yet to start, with the artist and venue
+    columns the listing pages render. Kept current by feed.py; `id` is the
+    show's id.
+    """
+    __tablename__ = 'upcoming_shows'
+    __table_args__ = (
+        db.Index('ix_upcoming_shows_start_time_id', 'start_time', 'id'),
+        db.Index('ix_upcoming_shows_artist_id', 'artist_id'),
+        db.Index('ix_upcoming_shows_venue_id', 'venue_id'),
+    )
+
+    id = db.Column(db.Integer, db.ForeignKey(
+        'shows.id', ondelete='CASCADE'), primary_key=True)
+    start_time = db.Column(db.DateTime(), nullable=False)
+    artist_id = db.Column(db.Integer, nullable=False)
+    venue_id = db.Column(db.Integer, nullable=False)
+    artist_name = db.Column(db.String)
+    artist_image_link = db.Column(db.String(500))
+    venue_name = db.Column(db.String)
+    venue_image_link = db.Column(db.String(500))
+
+    def __repr__(self):
+        return f'<UpcomingShow#{self.id}: {self.start_time}>'
+
+    @classmethod
+    def listing_query(cls):
+        """Upcoming feed rows, in the shape of Show.listing_query. Rows past
+        their start time are skipped until the rollover job removes them.
+        """
+        return db.session.query(
+            cls.id,
+            cls.start_time,
+            cls.artist_id,
+            cls.venue_id,
+            cls.artist_name,
+            cls.artist_image_link,
+            cls.venue_name,
+            cls.venue_image_link
+        ).filter(
+            cls.start_time > datetime.datetime.now()
+        )
+
+
+class IdempotencyKey(db.Model):
+    """A client-supplied key for a show booking, with a hash of the request
+    it came with and the ids of the shows it created, so a retry of the
+    same request gets the same shows back instead of new ones.
+    """
+    __tablename__ = 'idempotency_keys'
+
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    show_ids = db.Column(db.String, nullable=False)
+    created_at = db.Column(db.DateTime(), nullable=False, index=True,
+                           default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key}: {self.show_ids}>'
+
+
+class TableVersion(db.Model):
+    """Write counter for a catalogue table. Every transaction that changes
+    the table bumps it on commit, so a listing's stamp is a primary key
+    lookup rather than a scan of the table it lists.
+    """
+    __tablename__ = 'table_versions'
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime(), nullable=False,
+                           default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TableVersion {self.name}: {self.version}>'
+
+
+VERSIONED_TABLES = {
+    Venue: Venue.__tablename__,
+    Artist: Artist.__tablename__,
+    Show: Show.__tablename__,
+}
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def _seed_table_versions(target, connection, **kw):
+    now = datetime.datetime.utcnow()
+    connection.execute(target.insert(), [
+        {'name': name, 'version': 0, 'updated_at': now}
+        for name in VERSIONED_TABLES.values()
+    ])
+
+
+def bump_table_versions(session, *names):
+    """Count a write to the named tables when `session` commits. Call after
+    writing through Core, which the session events never see.
+    """
+    session.info.setdefault('written_tables', set()).update(names)
+
+
+@event.listens_for(db.session, 'before_commit')
+def _bump_written_tables(session):
+    # Every writer updates the same counter rows, and an UPDATE holds its
+    # row lock until the transaction ends. Issued as the transaction's last
+    # statement, concurrent writers queue on it only between this UPDATE and
+    # the COMMIT, instead of for a whole booking or import chunk.
+    if session.transaction.nested:
+        return
+
+    session.flush()
+    names = session.info.pop('written_tables', None)
+
+    if not names:
+        return
+
+    table = TableVersion.__table__
+    session.execute(table.update().where(
+        table.c.name.in_(sorted(names))
+    ).values(
+        version=table.c.version + 1,
+        updated_at=datetime.datetime.utcnow()
+    ))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_written_tables(session):
+    session.info.pop('written_tables', None)
+
+
+def filter_by_genre(model, genre, city=None, state=None):
+    """id/name rows of venues or artists tagged with `genre`, optionally in
+    `city` and/or `state`. The genre lookup walks the association table's
+    (genre_id, <model>_id) primary key.
+    """
+    query = db.session.query(
+        model.id, model.name
+    ).join(
+        model.genres
+    ).filter(
+        Genre.name == genre
+    )
+
+    if city:
+        query = query.filter(model.city == city)
+    if state:
+        query = query.filter(model.state == state)
+
+    return query
+
+
+def shows_partitioned_by_now(criterion):
+    """Upcoming and past shows matching `criterion`, fetched with one joined
+    query and split against a single captured "now" so both halves agree.
+    """
+    now = datetime.datetime.now()
+
+    shows_list = Show.listing_query().filter(
+        criterion
+    ).order_by(
+        Show.start_time, Show.id
+    )
+
+    upcoming_shows = []
+    past_shows = []
+
+    for row in shows_list:
+        if row.start_time > now:
+            upcoming_shows.append(Show.serialize_listing(row))
+        else:
+            past_shows.append(Show.serialize_listing(row))
+
+    return {'upcoming_shows_count': len(upcoming_shows),
+            'upcoming_shows': upcoming_shows,
+            'past_shows_count': len(past_shows),
+            'past_shows': past_shows,
+            }
+
+
+def detail_with_shows(model, entity_id):
+    """A serialized venue or artist with its upcoming and past shows, or None
+    if it does not exist. The entity and its shows are two independent
+    queries, run concurrently when CONCURRENT_QUERIES is on.
+    """
+    show_key = Show.venue_id if model is Venue else Show.artist_id
+
+    def entity():
+        obj = model.query.options(
+            db.joinedload(model.genres)
+        ).get(entity_id)
+        return obj.serialize if obj is not None else None
+
+    data, shows = gather(
+        entity,
+        lambda: shows_partitioned_by_now(show_key == entity_id),
+    )
+
+    if data is None:
+        return None
+
+    data.update(shows)
+    return data
+
+
+@event.listens_for(db.session, 'before_flush')
+def touch_updated_at(session, flush_context, instances):
+    """Stamp modified rows, including ones where only a relationship such as
+    `genres` changed and no column UPDATE would otherwise be issued.
+    """
+    now = datetime.datetime.utcnow()
+    written = set()
+
+    for obj in session.dirty:
+        if isinstance(obj, (Venue, Artist, Show)) and session.is_modified(obj):
+            obj.updated_at = now
+            written.add(VERSIONED_TABLES[type(obj)])
+
+    for obj in session.new.union(session.deleted):
+        if type(obj) in VERSIONED_TABLES:
+            written.add(VERSIONED_TABLES[type(obj)])
+
+    bump_table_versions(session, *written)
+
+
+@event.listens_for(db.session, 'after_bulk_delete')
+@event.listens_for(db.session, 'after_bulk_update')
+def bump_after_bulk(update_context):
+    model = update_context.mapper.class_
+
+    if model in VERSIONED_TABLES:
+        bump_table_versions(update_context.session, VERSIONED_TABLES[model])
+
+
+#----------------------------------------------------------------------------#
+# Commit hooks.
+#----------------------------------------------------------------------------#
+
+# Search and autocomplete indexes and the page cache mirror catalogue rows
+# outside the database, and may only follow a transaction once it commits.
+# Each registers a CommitHook: rows flushed during the transaction are
+# collected per hook (snapshotted at flush time, as objects expire on
+# commit), handed over after the commit and dropped on rollback.
+
+
+class CommitHook:
+
+    def __init__(self, models, apply, snapshot=None):
+        self.models = tuple(models)
+        self.apply = apply
+        self.snapshot = snapshot or (lambda obj: obj)
+
+    def pending(self, session):
+        """(changes, reloaded) collected for this hook in `session`."""
+        return session.info.setdefault('commit_hooks', {}).setdefault(
+            self, ({}, set()))
+
+
+_commit_hooks = []
+
+
+def on_commit(models, apply, snapshot=None):
+    """After each commit that wrote rows of `models`, call
+    `apply(changes, reloaded)`. `changes` maps (model, id) to
+    `snapshot(obj)` taken at flush time, or to None for a deleted row;
+    `reloaded` holds the models written in bulk (query updates and deletes,
+    or Core writes reported through mark_changed), whose rows are unknown.
+    """
+    hook = CommitHook(models, apply, snapshot)
+    _commit_hooks.append(hook)
+    return hook
+
+
+def mark_changed(session, *models):
+    """Report writes to `models` made through Core, which the flush events
+    never see."""
+    for hook in _commit_hooks:
+        hook.pending(session)[1].update(
+            model for model in models if model in hook.models)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_commit_changes(session, flush_context):
+    for hook in _commit_hooks:
+        written = [obj for obj in session.new.union(session.dirty)
+                   if isinstance(obj, hook.models)]
+        deleted = [obj for obj in session.deleted
+                   if isinstance(obj, hook.models)]
+
+        if not written and not deleted:
+            continue
+
+        changes = hook.pending(session)[0]
+        for obj in written:
+            changes[(type(obj), obj.id)] = hook.snapshot(obj)
+        for obj in deleted:
+            changes[(type(obj), obj.id)] = None
+
+
+@event.listens_for(db.session, 'after_bulk_delete')
+@event.listens_for(db.session, 'after_bulk_update')
+def _collect_bulk_changes(update_context):
+    mark_changed(update_context.session, update_context.mapper.class_)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _run_commit_hooks(session):
+    for hook, (changes, reloaded) in session.info.pop(
+            'commit_hooks', {}).items():
+        if changes or reloaded:
+            hook.apply(changes, reloaded)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_commit_changes(session):
+    session.info.pop('commit_hooks', None)
+
+#----------------------------------------------------------------------------#
+# Version stamps.
+#----------------------------------------------------------------------------#
+
+# A stamp is (token, last_modified): the token changes whenever anything a
+# page renders changes, and last_modified is the latest of those changes.
+# Both come from one indexed query, far cheaper than building the page.
+
+
+def table_stamp(*models):
+    """Stamp for pages listing every row of `models`' tables, read from
+    their TableVersion counters."""
+    names = [VERSIONED_TABLES[model] for model in models]
+
+    versions = {row.name: row for row in db.session.query(
+        TableVersion.name, TableVersion.version, TableVersion.updated_at
+    ).filter(
+        TableVersion.name.in_(names)
+    )}
+
+    token = ','.join(f'{name}:{versions[name].version}' if name in versions
+                     else f'{name}:-' for name in names)
+    last_modified = max((row.updated_at for row in versions.values()),
+                        default=None)
+
+    return token, last_modified
+
+
+def feed_stamp():
+    """Stamp for pages built from the upcoming feed: the listed tables plus
+    the next start time, which changes as soon as a show drops off.
+    """
+    token, last_modified = table_stamp(Show, Venue, Artist)
+
+    next_start = db.session.query(
+        db.func.min(UpcomingShow.start_time)
+    ).filter(
+        UpcomingShow.start_time > datetime.datetime.now()
+    ).scalar()
+
+    return f'{token},{next_start}', last_modified
+
+
+def detail_stamp(model, entity_id):
+    """Stamp for a venue or artist page: the entity, its shows, the other
+    side of each show, and the shows that have moved from upcoming to past.
+    Returns None if the entity doesn't exist.
+    """
+    now = datetime.datetime.now()
+
+    if model is Venue:
+        other, key, other_key = Artist, Show.venue_id, Show.artist_id
+    else:
+        other, key, other_key = Venue, Show.artist_id, Show.venue_id
+
+    row = db.session.query(
+        model.updated_at,
+        db.func.count(Show.id),
+        db.func.max(Show.updated_at),
+        db.func.max(other.updated_at),
+        db.func.max(db.case([(Show.start_time <= now, Show.start_time)]))
+    ).outerjoin(
+        Show, key == model.id
+    ).outerjoin(
+        other, other.id == other_key
+    ).filter(
+        model.id == entity_id
+    ).group_by(
+        model.id
+    ).first()
+
+    if row is None:
+        return None
+
+    # The latest show to have started moves the page's past/upcoming split
+    # without any write, so it counts as a modification time.
+    last_modified = max(filter(None, row[:1] + row[2:4]))
+    last_started = row[4]
+
+    if last_started is not None:
+        utc_offset = datetime.timedelta(seconds=round(
+            (datetime.datetime.utcnow() - now).total_seconds()))
+        last_modified = max(last_modified, last_started + utc_offset)
+
+    return ','.join(map(str, row)), last_modified
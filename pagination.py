@@ -0,0 +1,79 @@
+import base64
+import datetime
+import json
+from collections import namedtuple
+
+from flask import abort, current_app
+
+from models import db
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+# Listings are paged on an ordered, unique key (e.g. (start_time, id)) rather
+# than with OFFSET: each page filters on "key > last key seen", so fetching
+# page N costs the same index range scan as fetching page 1. Key columns must
+# be NOT NULL: a row tuple holding a NULL compares as NULL, and every row
+# after it would drop out of later pages.
+
+Page = namedtuple('Page', ['items', 'next_cursor'])
+
+
+def encode_cursor(values):
+    values = [v.isoformat() if isinstance(v, datetime.datetime) else v
+              for v in values]
+    payload = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(payload)
+
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(cursor)
+        if not all(isinstance(value, (str, int, float))
+                   and not isinstance(value, bool) for value in values):
+            raise ValueError(cursor)
+
+        return [datetime.datetime.fromisoformat(value)
+                if isinstance(key.type, db.DateTime) else value
+                for key, value in zip(keys, values)]
+    except (ValueError, TypeError):
+        abort(400)
+
+
+def page_size(limit=None):
+    if limit is None:
+        return current_app.config['PAGE_SIZE']
+    if limit < 1:
+        abort(400)
+    return min(limit, current_app.config['MAX_PAGE_SIZE'])
+
+
+def paginate(query, keys, cursor=None, limit=None):
+    """Return one Page of `query` ordered by `keys`.
+
+    `keys` must identify a row uniquely (end with the primary key) and be
+    selected by the query under the same names, so the next cursor can be
+    read back off the last row.
+    """
+    size = page_size(limit)
+
+    if cursor:
+        query = query.filter(
+            db.tuple_(*keys) > db.tuple_(*decode_cursor(cursor, keys))
+        )
+
+    rows = query.order_by(*keys).limit(size + 1).all()
+
+    next_cursor = None
+
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor([getattr(rows[-1], key.key)
+                                     for key in keys])
+
+    return Page(rows, next_cursor)
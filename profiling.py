@@ -0,0 +1,122 @@
+import collections
+import json
+import threading
+import time
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Request profiling.
+#----------------------------------------------------------------------------#
+
+
+class RequestProfile:
+    """SQL statements run while serving one request."""
+
+    def __init__(self, keep):
+        self.started = time.perf_counter()
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest = []
+
+    def record(self, statement, elapsed):
+        # Concurrent queries of the same request record from several threads
+        with self.lock:
+            self.queries += 1
+            self.db_time += elapsed
+
+            if len(self.slowest) < self.keep or \
+                    elapsed > self.slowest[-1][0]:
+                self.slowest.append((elapsed, statement))
+                self.slowest.sort(key=lambda item: item[0], reverse=True)
+                del self.slowest[self.keep:]
+
+    def summary(self, response):
+        return {'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+                'db_ms': round(self.db_time * 1000, 2),
+                'queries': self.queries,
+                'slowest': [{'ms': round(elapsed * 1000, 2), 'sql': statement}
+                            for elapsed, statement in self.slowest],
+                }
+
+
+class Profiler:
+    """Counts and times SQL per request, reporting it in a Server-Timing
+    header and a log line. Requests slower than SLOW_REQUEST_MS are kept in a
+    ring buffer of the last SLOW_REQUEST_BUFFER entries.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.slow_requests = collections.deque()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROFILE_REQUESTS', False)
+        app.config.setdefault('SLOW_REQUEST_MS', 500)
+        app.config.setdefault('SLOW_REQUEST_BUFFER', 100)
+        app.config.setdefault('PROFILE_SLOWEST_STATEMENTS', 3)
+
+        self.slow_requests = collections.deque(
+            maxlen=app.config['SLOW_REQUEST_BUFFER'])
+        app.extensions['profiler'] = self
+
+        if app.config['PROFILE_REQUESTS']:
+            app.before_request(self.start)
+            app.after_request(self.finish)
+
+    def start(self):
+        g.profile = RequestProfile(
+            current_app.config['PROFILE_SLOWEST_STATEMENTS'])
+
+    def finish(self, response):
+        profile = g.get('profile')
+        if profile is None:
+            return response
+
+        summary = profile.summary(response)
+        response.headers.add(
+            'Server-Timing',
+            'db;dur=%.2f;desc="%d queries", app;dur=%.2f' % (
+                summary['db_ms'], summary['queries'], summary['total_ms']))
+
+        current_app.logger.info('request %s', json.dumps(
+            {key: value for key, value in summary.items() if key != 'slowest'}))
+
+        if summary['total_ms'] >= current_app.config['SLOW_REQUEST_MS']:
+            with self.lock:
+                self.slow_requests.append(summary)
+
+        return response
+
+    def slow(self):
+        with self.lock:
+            return list(reversed(self.slow_requests))
+
+
+profiler = Profiler()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context,
+                      executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    if not has_app_context():
+        return
+    profile = g.get('profile')
+    if profile is not None:
+        profile.record(statement,
+                       time.perf_counter() - context._query_started)
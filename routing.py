@@ -0,0 +1,174 @@
+import itertools
+import threading
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, \
+    request, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, exc, orm, text
+from sqlalchemy.sql.dml import UpdateBase
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+# Views marked @read_only send their queries to a replica from
+# SQLALCHEMY_REPLICA_URIS, picked round-robin among those passing a health
+# check. Everything else, and anything flushed or written from a read-only
+# view, goes to the primary. After a visitor commits a write their reads
+# stay on the primary for READ_YOUR_WRITES_SECONDS, so they see their own
+# change even while the replicas are behind.
+
+# Replay lag, zero when a replica has applied everything it received
+REPLICA_LAG = text(
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+def replica_key(index):
+    return f'replica_{index}'
+
+
+def read_only(view):
+    """Mark a view as safe to serve from a replica."""
+    view.read_only = True
+    return view
+
+
+class ReplicaRouter:
+    """Round-robin over the replica binds, skipping any that failed their
+    last health check. Each replica is checked at most once per `interval`
+    seconds, on the request that finds its result expired.
+    """
+
+    def __init__(self, keys, interval, max_lag):
+        self.keys = keys
+        self.interval = interval
+        self.max_lag = max_lag
+        self.lock = threading.Lock()
+        self.cycle = itertools.cycle(keys)
+        self.checked = dict.fromkeys(keys, float('-inf'))
+        self.healthy = dict.fromkeys(keys, True)
+
+    def choose(self, db, app):
+        for _ in self.keys:
+            with self.lock:
+                key = next(self.cycle)
+            if self.is_healthy(db, app, key):
+                return db.get_engine(app, bind=key)
+
+        return None
+
+    def is_healthy(self, db, app, key):
+        now = time.monotonic()
+
+        with self.lock:
+            if now - self.checked[key] < self.interval:
+                return self.healthy[key]
+            # Claim the check so concurrent requests keep the last result
+            self.checked[key] = now
+
+        engine = db.get_engine(app, bind=key)
+
+        try:
+            with engine.connect() as conn:
+                lag = conn.execute(REPLICA_LAG).scalar() \
+                    if engine.dialect.name == 'postgresql' else 0
+            healthy = lag is None or lag <= self.max_lag
+        except exc.DBAPIError:
+            healthy = False
+
+        if healthy != self.healthy[key]:
+            app.logger.warning('replica %s is %s', key,
+                               'healthy' if healthy else 'unhealthy')
+        self.healthy[key] = healthy
+
+        return healthy
+
+
+class RoutingSession(SignallingSession):
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or isinstance(clause, UpdateBase) or \
+                not reading_from_replica():
+            return super().get_bind(mapper, clause)
+
+        # One replica per request, shared with its concurrent queries
+        if 'replica_engine' not in g:
+            g.replica_engine = self.app.extensions['replica_router'].choose(
+                self.db, self.app)
+
+        return g.replica_engine or super().get_bind(mapper, clause)
+
+
+def reading_from_replica():
+    return has_app_context() and g.get('read_replica', False)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy whose sessions route read-only views to replicas."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        event.listen(self.session, 'after_flush', note_write)
+        event.listen(self.session, 'after_commit', hold_reads_on_primary)
+        event.listen(self.session, 'after_rollback', forget_write)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_HEALTH_INTERVAL', 5)
+        app.config.setdefault('REPLICA_MAX_LAG', 10)
+        app.config.setdefault('READ_YOUR_WRITES_SECONDS', 5)
+
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        keys = []
+        for index, uri in enumerate(app.config['SQLALCHEMY_REPLICA_URIS']):
+            keys.append(replica_key(index))
+            binds[replica_key(index)] = uri
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+        app.extensions['replica_router'] = ReplicaRouter(
+            keys,
+            app.config['REPLICA_HEALTH_INTERVAL'],
+            app.config['REPLICA_MAX_LAG'])
+        app.before_request(route_reads)
+
+        super().init_app(app)
+
+
+def route_reads():
+    if not current_app.extensions['replica_router'].keys:
+        return
+
+    view = current_app.view_functions.get(request.endpoint)
+    g.read_replica = getattr(view, 'read_only', False) and \
+        session.get('_read_primary_until', 0) < time.time()
+
+
+#----------------------------------------------------------------------------#
+# Read-your-writes.
+#----------------------------------------------------------------------------#
+
+
+def note_write(db_session, flush_context):
+    db_session.info['wrote'] = True
+
+
+def hold_reads_on_primary(db_session):
+    if db_session.info.pop('wrote', False) and has_request_context():
+        session['_read_primary_until'] = time.time() + \
+            current_app.config['READ_YOUR_WRITES_SECONDS']
+
+
+def forget_write(db_session):
+    db_session.info.pop('wrote', None)
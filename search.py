@@ -0,0 +1,206 @@
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from models import db, Venue, Artist, Genre, on_commit
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# Venues and artists are matched case-insensitively on any substring of
+# these columns or of a genre name. On PostgreSQL each column carries a
+# pg_trgm GIN index, which ILIKE '%term%' can use, and results are ranked by
+# trigram similarity. Other databases (SQLite test runs) use an in-process
+# trigram inverted index with the same matching rules, kept per app and
+# current from ORM commits.
+
+SEARCH_FIELDS = ('name', 'city', 'state')
+
+
+def search(model, term, limit=None):
+    """Return up to `limit` {'id', 'name'} dicts of `model` matching `term`,
+    best matches first. `limit` is clamped to [1, SEARCH_RESULT_LIMIT].
+    """
+    term = (term or '').strip()
+    max_limit = current_app.config['SEARCH_RESULT_LIMIT']
+    limit = max(1, min(limit or max_limit, max_limit))
+
+    if not term:
+        return []
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        rows = _search_postgresql(model, term, limit)
+    else:
+        rows = _memory_index(model).search(term, limit)
+
+    return [{'id': row[0], 'name': row[1]} for row in rows]
+
+
+def _search_postgresql(model, term, limit):
+    pattern = '%{}%'.format(
+        term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    )
+    fields = [getattr(model, name) for name in SEARCH_FIELDS]
+
+    # Two branches so each keeps its index: the column match is a
+    # BitmapOr over the trigram indexes, the genre match a join through the
+    # association table. OR-ing an EXISTS into the column match would force
+    # a sequential scan.
+    matched = db.union(
+        db.session.query(model.id.label('id')).filter(db.or_(
+            *[field.ilike(pattern, escape='\\') for field in fields]
+        )).statement,
+        db.session.query(model.id.label('id')).join(model.genres).filter(
+            Genre.name.ilike(pattern, escape='\\')
+        ).statement
+    ).alias('matched')
+
+    rank = 2 * db.func.similarity(model.name, term) + db.func.greatest(
+        *[db.func.similarity(field, term) for field in fields[1:]]
+    )
+
+    return db.session.query(
+        model.id, model.name
+    ).join(
+        matched, matched.c.id == model.id
+    ).order_by(
+        rank.desc(), model.name, model.id
+    ).limit(limit).all()
+
+#----------------------------------------------------------------------------#
+# In-process fallback.
+#----------------------------------------------------------------------------#
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index from trigrams of the lower-cased search fields to ids.
+
+    A term's trigrams must all occur in a document that contains it, so the
+    intersection of their postings is a candidate set that only needs a
+    substring check. Terms shorter than three characters check every
+    document.
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.postings = {}
+
+    def add(self, doc_id, name, fields):
+        self.remove(doc_id)
+
+        fields = [(field or '').lower() for field in fields]
+        self.documents[doc_id] = (name, fields)
+
+        for gram in set().union(*map(trigrams, fields)):
+            self.postings.setdefault(gram, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        document = self.documents.pop(doc_id, None)
+
+        if document is None:
+            return
+
+        for gram in set().union(*map(trigrams, document[1])):
+            ids = self.postings.get(gram)
+            ids.discard(doc_id)
+            if not ids:
+                del self.postings[gram]
+
+    def search(self, term, limit):
+        term = term.lower()
+        grams = sorted((self.postings.get(gram, set())
+                        for gram in trigrams(term)), key=len)
+
+        if grams:
+            candidates = set.intersection(*grams)
+        else:
+            candidates = self.documents
+
+        matches = []
+
+        for doc_id in candidates:
+            name, fields = self.documents[doc_id]
+
+            if fields[0].startswith(term):
+                rank = 0
+            elif term in fields[0]:
+                rank = 1
+            elif any(term in field for field in fields[1:]):
+                rank = 2
+            else:
+                continue
+
+            matches.append((rank, name or '', doc_id))
+
+        matches.sort()
+
+        return [(doc_id, name) for _, name, doc_id in matches[:limit]]
+
+
+def _memory_indexes():
+    # Per app, so an index never outlives the database it was built from
+    return current_app.extensions.setdefault('search_indexes', {})
+
+
+def _memory_index(model):
+    indexes = _memory_indexes()
+    index = indexes.get(model)
+
+    if index is None:
+        index = TrigramIndex()
+        columns = [getattr(model, name) for name in SEARCH_FIELDS]
+        genres = {}
+
+        for doc_id, genre in db.session.query(
+                model.id, Genre.name).join(model.genres):
+            genres.setdefault(doc_id, []).append(genre)
+
+        for row in db.session.query(model.id, *columns):
+            index.add(row[0], row[1],
+                      [*row[1:], ','.join(genres.get(row[0], []))])
+
+        indexes[model] = index
+
+    return index
+
+
+def _document(obj):
+    return [*[getattr(obj, name) for name in SEARCH_FIELDS],
+            ','.join(genre.name for genre in obj.genres)]
+
+
+def _apply_search_changes(changes, reloaded):
+    if not has_app_context():
+        return
+
+    indexes = _memory_indexes()
+    for model in reloaded:
+        indexes.pop(model, None)
+
+    for (model, doc_id), document in changes.items():
+        index = indexes.get(model)
+
+        if index is None:
+            continue
+        if document is None:
+            index.remove(doc_id)
+        else:
+            index.add(doc_id, *document)
+
+
+on_commit((Venue, Artist), _apply_search_changes,
+          snapshot=lambda obj: (obj.name, _document(obj)))
+
+
+@event.listens_for(Venue.__table__, 'after_create')
+@event.listens_for(Venue.__table__, 'after_drop')
+@event.listens_for(Artist.__table__, 'after_create')
+@event.listens_for(Artist.__table__, 'after_drop')
+def _reset_memory_index(target, connection, **kw):
+    if has_app_context():
+        model = Venue if target is Venue.__table__ else Artist
+        _memory_indexes().pop(model, None)
@@ -2,3 +2,33 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Inputs with data-autocomplete="venues" or "artists" offer matching ids
+// in their datalist as the visitor types a name.
+document.querySelectorAll('input[data-autocomplete]').forEach(function (input) {
+  var list = document.getElementById(input.getAttribute('list'));
+  var pending = null;
+
+  input.addEventListener('input', function () {
+    var q = input.value.trim();
+    if (!q || /^\d+$/.test(q)) return;
+
+    if (pending) pending.abort();
+    pending = new AbortController();
+
+    fetch('/api/v1/autocomplete/' + input.dataset.autocomplete +
+          '?q=' + encodeURIComponent(q), {signal: pending.signal})
+      .then(function (response) { return response.json(); })
+      .then(function (matches) {
+        list.innerHTML = '';
+        matches.forEach(function (match) {
+          var option = document.createElement('option');
+          option.value = match.id;
+          option.label = match.name;
+          option.textContent = match.name;
+          list.appendChild(option);
+        });
+      })
+      .catch(function () {});
+  });
+});
@@ -0,0 +1,55 @@
+import os
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from jinja2 import FileSystemBytecodeCache
+
+#----------------------------------------------------------------------------#
+# Templates.
+#----------------------------------------------------------------------------#
+
+# Jinja compiles a template to Python the first time it is rendered, so
+# without help every new worker pays that on its first hit of each page.
+# With TEMPLATE_WARMUP every template is compiled when wsgi.py loads the
+# app for serving; under gunicorn's preload_app that happens once in the
+# master and the workers fork with them compiled. CLI commands skip it.
+# TEMPLATE_BYTECODE_CACHE_DIR keeps the compiled code on disk (keyed by a
+# checksum of the source, so edits are picked up), and `flask templates
+# compile` fills it ahead of a deploy.
+
+
+def init_app(app):
+    app.config.setdefault('TEMPLATE_BYTECODE_CACHE_DIR', None)
+    app.config.setdefault('TEMPLATE_WARMUP', False)
+
+    cache_dir = app.config['TEMPLATE_BYTECODE_CACHE_DIR']
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+
+def compile_templates(app):
+    """Load every template into the environment's cache (and the bytecode
+    cache, if any). Returns the template names. Needs the app's filters
+    registered, so call it on a finished app."""
+    names = app.jinja_env.list_templates(extensions=['html'])
+
+    for name in names:
+        app.jinja_env.get_template(name)
+
+    return names
+
+
+templates_cli = AppGroup('templates', help='Template compilation.')
+
+
+@templates_cli.command('compile')
+def compile_command():
+    """Compile every template into TEMPLATE_BYTECODE_CACHE_DIR."""
+    if not current_app.config['TEMPLATE_BYTECODE_CACHE_DIR']:
+        raise click.UsageError('TEMPLATE_BYTECODE_CACHE_DIR is not set.')
+
+    names = compile_templates(current_app)
+    click.echo(f'Compiled {len(names)} templates into '
+               f'{current_app.config["TEMPLATE_BYTECODE_CACHE_DIR"]}')
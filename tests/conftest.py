@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+import pytest
+
+# config.py reads the environment at import, so point it at a scratch
+# SQLite database before the app is imported
+DATABASE = os.path.join(tempfile.mkdtemp(prefix='fyyur-tests-'), 'fyyur.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE}'
+os.environ.setdefault('SECRET_KEY', 'tests')
+
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'CACHE_BACKEND': 'none',
+    })
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def queries(app):
+    """Statements sent to the database while the test runs."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db.event.listen(db.engine, 'before_cursor_execute', record)
+    yield statements
+    db.event.remove(db.engine, 'before_cursor_execute', record)
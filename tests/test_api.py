@@ -0,0 +1,42 @@
+import pytest
+
+import api
+
+
+@pytest.mark.parametrize('method, path, status', [
+    ('get', '/api/v1/venues/1', 404),
+    ('get', '/api/v1/nowhere', 404),
+    ('delete', '/api/v1/venues', 405),
+    ('get', '/api/v1/venues?limit=0', 400),
+    ('get', '/api/v1/venues?cursor=W251bGxd', 400),
+])
+def test_errors_are_json(client, method, path, status):
+    response = getattr(client, method)(path)
+
+    assert response.status_code == status
+    assert response.is_json
+    assert response.get_json()['error']
+
+
+def test_unhandled_errors_are_json(app, client, monkeypatch):
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(api, 'search', fail)
+
+    response = client.get('/api/v1/venues/search?q=hop')
+
+    assert response.status_code == 500
+    assert response.get_json() == {'error': 'Internal Server Error'}
+
+
+def test_html_errors_stay_html(client):
+    response = client.get('/nowhere')
+
+    assert response.status_code == 404
+    assert response.mimetype == 'text/html'
+
+
+def test_catalogue_is_not_exported_over_http(client):
+    assert client.get('/api/v1/export/venues').status_code == 404
@@ -0,0 +1,85 @@
+import datetime
+
+from models import db, Venue, bump_table_versions
+
+
+def names(client, prefix, **params):
+    response = client.get('/api/v1/autocomplete/venues',
+                          query_string=dict(params, q=prefix))
+    assert response.status_code == 200
+    return [match['name'] for match in response.get_json()]
+
+
+def refreshed(app):
+    # Let a refresh started by the last request finish
+    for synced in app.extensions['autocomplete_indexes'].values():
+        thread = synced.refreshing
+        if thread is not None:
+            thread.join()
+
+
+def add_venue(name):
+    venue = Venue(name=name, city='San Francisco', state='CA',
+                  address='1015 Folsom Street')
+    db.session.add(venue)
+    db.session.commit()
+    return venue
+
+
+def write_elsewhere(statement):
+    # As another worker would: no ORM events, only the write counter
+    db.session.execute(statement)
+    bump_table_versions(db.session, Venue.__tablename__)
+    db.session.commit()
+
+
+def test_commits_show_up_at_once(client):
+    venue = add_venue('The Musical Hop')
+    assert names(client, 'the mus') == ['The Musical Hop']
+
+    add_venue('The Dueling Pianos Bar')
+    assert names(client, 'the d') == ['The Dueling Pianos Bar']
+
+    venue.name = 'Park Square Live Music'
+    db.session.commit()
+    assert names(client, 'the mus') == []
+    assert names(client, 'park') == ['Park Square Live Music']
+
+    db.session.delete(venue)
+    db.session.commit()
+    assert names(client, 'park') == []
+
+
+def test_other_workers_writes_show_up(app, client):
+    app.config['AUTOCOMPLETE_SYNC_INTERVAL'] = 0
+    venue = add_venue('The Musical Hop')
+    assert names(client, 'the') == ['The Musical Hop']
+
+    table = Venue.__table__
+    write_elsewhere(table.insert().values(
+        name='The Dueling Pianos Bar', city='New York', state='NY'))
+    # Stamped older than the last sync, as by a worker whose clock lags
+    write_elsewhere(table.update().where(table.c.id == venue.id).values(
+        name='Park Square Live Music',
+        updated_at=datetime.datetime(2000, 1, 1)))
+
+    names(client, 'the')
+    refreshed(app)
+
+    assert names(client, 'the') == ['The Dueling Pianos Bar']
+    assert names(client, 'park') == ['Park Square Live Music']
+
+    write_elsewhere(table.delete().where(table.c.id == venue.id))
+    names(client, 'park')
+    refreshed(app)
+
+    assert names(client, 'park') == []
+
+
+def test_limit_is_clamped(client):
+    for n in range(3):
+        add_venue(f'Venue {n}')
+
+    assert len(names(client, 'venue', limit=2)) == 2
+    assert len(names(client, 'venue', limit=-1)) == 1
+    assert len(names(client, 'venue', limit=0)) == 3
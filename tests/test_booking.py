@@ -0,0 +1,59 @@
+import datetime
+
+import pytest
+
+import booking
+from booking import book_shows, BookingError
+from models import db, Venue, Artist, Show
+
+
+@pytest.fixture
+def slot(app):
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA',
+                  address='1015 Folsom Street')
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+    db.session.add_all([venue, artist])
+    db.session.commit()
+
+    return {'artist_id': artist.id,
+            'venue_id': venue.id,
+            'start_time': datetime.datetime(2035, 4, 1, 20, 0),
+            }
+
+
+def test_booked_slot_is_rejected(slot):
+    book_shows([slot])
+
+    with pytest.raises(BookingError):
+        book_shows([slot])
+
+    assert Show.query.count() == 1
+
+
+def test_slot_taken_after_the_check_is_rejected(slot, monkeypatch):
+    # A concurrent booking commits between the check and the write
+    def check(entries):
+        db.session.add(Show(**slot))
+        db.session.commit()
+
+    monkeypatch.setattr(booking, 'check', check)
+
+    with pytest.raises(BookingError):
+        book_shows([slot], key='retry-1')
+
+    assert Show.query.count() == 1
+
+
+def test_start_times_with_offsets_are_rejected(client, slot):
+    response = client.post('/api/v1/shows', json=[
+        dict(slot, start_time='2035-04-01T20:00:00+02:00'),
+    ])
+
+    assert response.status_code == 422
+    assert Show.query.count() == 0
+
+    response = client.post('/api/v1/shows', json=[
+        dict(slot, start_time='2035-04-01T20:00:00'),
+    ])
+
+    assert response.status_code == 201
@@ -0,0 +1,106 @@
+import pytest
+
+from cache import LRUCache, RedisCache
+from models import db, Venue, Artist
+
+
+class FakeRedis:
+    """The slice of the redis client RedisCache uses, in a dict."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+
+class DownRedis:
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError('Connection refused')
+        return fail
+
+
+BACKENDS = {
+    'lru': LRUCache,
+    'redis': lambda: RedisCache(FakeRedis()),
+}
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def store(request, app):
+    store = app.extensions['response_cache'] = BACKENDS[request.param]()
+    return store
+
+
+def add_venue(name='The Musical Hop'):
+    venue = Venue(name=name, city='San Francisco', state='CA',
+                  address='1015 Folsom Street')
+    db.session.add(venue)
+    db.session.commit()
+    return venue
+
+
+def test_commit_bumps_the_written_tags(store):
+    add_venue()
+    assert store.versions(['venue', 'artist']) == [1, 0]
+
+    db.session.add(Artist(name='Guns N Petals', city='San Francisco',
+                          state='CA'))
+    db.session.commit()
+    assert store.versions(['venue', 'artist']) == [1, 1]
+
+
+def test_rollback_does_not_bump(store):
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco',
+                         state='CA'))
+    db.session.flush()
+    db.session.rollback()
+
+    assert store.versions(['venue', 'artist', 'show']) == [0, 0, 0]
+
+
+def test_backends_agree(app, client):
+    pages = {}
+
+    for name, backend in sorted(BACKENDS.items()):
+        app.extensions['response_cache'] = store = backend()
+        seen = []
+
+        venue = add_venue()
+        seen.append(client.get('/venues').data)
+        seen.append(client.get('/venues').data)
+
+        venue.name = 'Park Square'
+        db.session.commit()
+        seen.append(client.get('/venues').data)
+
+        db.session.delete(venue)
+        db.session.commit()
+        seen.append(client.get('/venues').data)
+
+        pages[name] = (seen, store.versions(['venue', 'artist', 'show']))
+
+    assert pages['lru'] == pages['redis']
+    assert b'Park Square' in pages['lru'][0][2]
+
+
+def test_unreachable_redis_serves_uncached(app, client):
+    app.extensions['response_cache'] = RedisCache(DownRedis())
+    add_venue()
+
+    response = client.get('/venues')
+
+    assert response.status_code == 200
+    assert b'The Musical Hop' in response.data
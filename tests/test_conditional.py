@@ -0,0 +1,75 @@
+import datetime
+
+from cache import LRUCache
+from models import db, Venue, Artist, Show
+
+
+def test_cached_page_follows_a_time_driven_stamp(app, client):
+    app.extensions['response_cache'] = LRUCache()
+
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA',
+                  address='1015 Folsom Street')
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+    show = Show(venue=venue, artist=artist,
+                start_time=datetime.datetime.now() + datetime.timedelta(
+                    days=1))
+    db.session.add(show)
+    db.session.commit()
+
+    first = client.get(f'/venues/{venue.id}')
+    assert b'1 Upcoming Show' in first.data
+
+    # The show starts: no write goes through the session, so no cache tag
+    # is bumped, but the page's stamp moves
+    db.session.execute(Show.__table__.update().values(
+        start_time=datetime.datetime.now() - datetime.timedelta(minutes=1)))
+    db.session.commit()
+
+    second = client.get(f'/venues/{venue.id}')
+    assert second.get_etag() != first.get_etag()
+    assert b'1 Past Show' in second.data
+
+
+def test_listing_stamp_follows_writes(client, queries):
+    venue = Venue(name='Park Square Live Music & Coffee', city='San Francisco',
+                  state='CA', address='34 Whiskey Moore Ave')
+    db.session.add(venue)
+    db.session.commit()
+
+    before = client.get('/venues').get_etag()
+
+    venue.name = 'Park Square'
+    db.session.commit()
+    renamed = client.get('/venues').get_etag()
+
+    db.session.delete(venue)
+    db.session.commit()
+    deleted = client.get('/venues').get_etag()
+
+    assert len({before, renamed, deleted}) == 3
+
+    # A 304 costs the stamp lookup alone
+    queries.clear()
+    response = client.get('/venues', headers={'If-None-Match': deleted[0]})
+    assert response.status_code == 304
+    assert len(queries) == 1
+    assert 'table_versions' in queries[0]
+
+
+def test_table_versions_are_bumped_last(client, queries):
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA',
+                  address='1015 Folsom Street')
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+    db.session.add_all([venue, artist])
+    db.session.commit()
+    queries.clear()
+
+    response = client.post('/api/v1/shows', json=[
+        {'artist_id': artist.id, 'venue_id': venue.id,
+         'start_time': '2035-04-01T20:00:00'},
+    ])
+
+    assert response.status_code == 201
+    # The shared counter row is locked only from here until the commit
+    assert queries[-1].startswith('UPDATE table_versions')
+    assert sum('table_versions' in query for query in queries) == 1
@@ -0,0 +1,26 @@
+from models import db, Genre, Venue
+
+
+def test_from_names_reuses_new_genres(app):
+    first = Genre.from_names(['Jazz', 'Folk'])
+    second = Genre.from_names(['Folk', 'Jazz', 'Folk'])
+
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco',
+                         state='CA', genres=first))
+    db.session.add(Venue(name='Park Square', city='San Francisco',
+                         state='CA', genres=second))
+    db.session.commit()
+
+    assert [genre.name for genre in second] == ['Folk', 'Jazz']
+    assert Genre.query.count() == 2
+
+
+def test_from_names_survives_a_concurrent_insert(app):
+    # Committed by another request after this one looked the name up
+    db.session.execute(Genre.__table__.insert(), [{'name': 'Jazz'}])
+
+    genres = Genre.from_names(['Jazz'])
+    db.session.commit()
+
+    assert genres[0].id is not None
+    assert Genre.query.count() == 1
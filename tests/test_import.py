@@ -0,0 +1,45 @@
+import json
+
+from models import Venue
+
+
+VENUE = {'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+         'address': '1015 Folsom Street', 'phone': '123-123-1234',
+         'genres': ['Jazz'], 'website': 'https://www.themusicalhop.com',
+         'facebook_link': 'https://www.facebook.com/TheMusicalHop'}
+
+
+def run_import(app, tmp_path, lines, *args):
+    source = tmp_path / 'venues.ndjson'
+    source.write_text('\n'.join(lines) + '\n')
+
+    return app.test_cli_runner(mix_stderr=False).invoke(
+        args=['catalogue', 'import', 'venues', str(source), *args])
+
+
+def test_invalid_json_lines_are_rejected(app, tmp_path):
+    result = run_import(app, tmp_path, [
+        json.dumps(VENUE),
+        '{"name": "Park Square",',
+        '[1, 2]',
+        json.dumps(dict(VENUE, name='Park Square')),
+    ])
+
+    assert result.exit_code == 0
+    assert 'line 2: rejected (invalid JSON)' in result.stderr
+    assert 'line 3: rejected (invalid JSON)' in result.stderr
+    assert 'Imported 2 venues' in result.stdout
+    assert '2 rejected' in result.stdout
+    assert Venue.query.count() == 2
+
+
+def test_failed_chunks_say_why(app, tmp_path):
+    # Both rows keep id 1, so the second insert violates the primary key
+    result = run_import(app, tmp_path, [
+        json.dumps(dict(VENUE, id=1)),
+        json.dumps(dict(VENUE, id=1, name='Park Square')),
+    ])
+
+    assert result.exit_code == 1
+    assert 'chunk ending at line 2 failed (' in result.stderr
+    assert 'UNIQUE constraint failed' in result.stderr
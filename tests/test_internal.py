@@ -0,0 +1,23 @@
+import pytest
+
+PATHS = ['/internal/pool', '/internal/slow-requests', '/metrics']
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_internal_endpoints_need_the_token(app, client, path):
+    app.config['INTERNAL_TOKEN'] = 's3cret'
+
+    # Loopback, as every client looks behind a reverse proxy
+    assert client.get(path).status_code == 404
+    assert client.get(path, headers={
+        'Authorization': 'Bearer wrong'}).status_code == 404
+    assert client.get(path, headers={
+        'Authorization': 'Bearer s3cret'}).status_code == 200
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_internal_endpoints_are_off_without_a_token(app, client, path):
+    app.config['INTERNAL_TOKEN'] = None
+
+    assert client.get(path, headers={
+        'Authorization': 'Bearer '}).status_code == 404
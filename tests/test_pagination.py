@@ -0,0 +1,64 @@
+import base64
+import json
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Artist
+
+
+def add_artists(names):
+    artists = [Artist(name=name, city='', state='CA') for name in names]
+    db.session.add_all(artists)
+    db.session.commit()
+    return artists
+
+
+def cursor(values):
+    payload = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def test_pages_cover_duplicate_names_once(client):
+    artists = add_artists(['Matt Quevedo', '', 'Guns N Petals', '',
+                           'Guns N Petals', 'Guns N Petals', 'Zoe'])
+    expected = [artist.id for artist in sorted(
+        artists, key=lambda artist: (artist.name, artist.id))]
+
+    seen = []
+    next_cursor = None
+
+    while True:
+        query = {'limit': 2}
+        if next_cursor:
+            query['cursor'] = next_cursor
+        body = client.get('/api/v1/artists', query_string=query).get_json()
+
+        seen.extend(row['id'] for row in body['data'])
+        next_cursor = body['next_cursor']
+        if next_cursor is None:
+            break
+
+    assert seen == expected
+
+
+def test_artist_names_are_required(app):
+    db.session.add(Artist(name=None, city='San Francisco', state='CA'))
+
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+@pytest.mark.parametrize('values', [
+    [None, 1],
+    [['Guns N Petals'], 1],
+    [{'name': 'Guns N Petals'}, 1],
+    ['Guns N Petals', True],
+    ['Guns N Petals'],
+])
+def test_malformed_cursors_are_rejected(client, values):
+    response = client.get('/api/v1/artists',
+                          query_string={'cursor': cursor(values)})
+
+    assert response.status_code == 400
@@ -0,0 +1,21 @@
+from app import create_app
+
+
+def test_profiling_is_off_by_default(client):
+    response = client.get('/')
+
+    assert response.status_code == 200
+    assert 'Server-Timing' not in response.headers
+
+
+def test_profiling_reports_server_timing(app):
+    app = create_app({
+        'TESTING': True,
+        'CACHE_BACKEND': 'none',
+        'PROFILE_REQUESTS': True,
+    })
+
+    response = app.test_client().get('/')
+
+    assert response.status_code == 200
+    assert response.headers['Server-Timing'].startswith('db;dur=')
@@ -0,0 +1,34 @@
+import pytest
+
+from models import db, Venue
+
+
+def add_venues(count):
+    db.session.add_all(
+        Venue(name=f'The Musical Hop {n}', city='San Francisco', state='CA')
+        for n in range(count))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('limit, expected', [
+    (None, 20), (5, 5), (100000, 20), (0, 20), (-1, 1),
+])
+def test_search_limit_is_clamped(client, limit, expected):
+    add_venues(25)
+
+    response = client.get('/api/v1/venues/search',
+                          query_string={'q': 'hop', 'limit': limit})
+
+    assert response.status_code == 200
+    assert response.get_json()['count'] == expected
+
+
+def test_search_follows_commits(client):
+    add_venues(1)
+    assert client.get('/api/v1/venues/search?q=hop').get_json()['count'] == 1
+
+    Venue.query.one().name = 'Park Square'
+    db.session.commit()
+
+    assert client.get('/api/v1/venues/search?q=hop').get_json()['count'] == 0
+    assert client.get('/api/v1/venues/search?q=park').get_json()['count'] == 1
@@ -0,0 +1,40 @@
+import datetime
+
+from models import db, Venue, Artist, Show
+
+# The stamp behind the conditional GET, then the grouped directory itself
+VENUES_QUERIES = 2
+
+
+def add_venues(count, shows_each=2):
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+    start_time = datetime.datetime.now() + datetime.timedelta(days=7)
+
+    for n in range(count):
+        venue = Venue(name=f'Venue {n}', city=f'City {n % 3}', state='CA',
+                      address=f'{n} Main St')
+        venue.shows = [Show(artist=artist,
+                            start_time=start_time + datetime.timedelta(days=i))
+                       for i in range(shows_each)]
+        db.session.add(venue)
+
+    db.session.commit()
+
+
+def test_venues_query_count_is_fixed(client, queries):
+    add_venues(3)
+    queries.clear()
+
+    response = client.get('/venues')
+
+    assert response.status_code == 200
+    assert len(queries) == VENUES_QUERIES
+
+    add_venues(20)
+    queries.clear()
+
+    response = client.get('/venues')
+
+    assert response.status_code == 200
+    assert b'Venue 19' in response.data
+    assert len(queries) == VENUES_QUERIES
@@ -0,0 +1,16 @@
+import config
+import templating
+from app import create_app
+
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app()
+
+# Sessions and CSRF tokens signed by one worker have to verify in every
+# other, so serving needs a configured key rather than a per-process one
+if not config.SECRET_KEY and not app.debug:
+    raise RuntimeError('SECRET_KEY must be set; every worker has to share it')
+
+# Compiled here rather than in create_app so CLI commands start quickly;
+# with preload_app the workers fork with every template compiled
+if app.config['TEMPLATE_WARMUP']:
+    templating.compile_templates(app)